@@ -0,0 +1,302 @@
+import collections
+import functools
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import librosa
+import numpy as np
+
+from resampler import QUALITY_TIERS, resample
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+try:
+    import av
+except ImportError:
+    av = None
+
+SAMPLE_RATE = 16000
+
+FFMPEG = shutil.which("ffmpeg")
+FFMPEG_TIMEOUT = 30
+
+
+class DecodeError(Exception):
+    """No decode path could turn the upload into audio"""
+
+
+def to_mono(samples, sample_rate, target_rate=SAMPLE_RATE, quality="medium"):
+    """Mix down (frames, channels) to mono float32 and resample to target_rate"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    samples = resample(samples, sample_rate, target_rate, quality)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+def decode_soundfile(data, target_rate=SAMPLE_RATE, quality="medium"):
+    """WAV, FLAC, Ogg/Vorbis (and Ogg/Opus, MP3 on libsndfile >= 1.1) from memory"""
+    samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=False)
+    return to_mono(samples, sample_rate, target_rate, quality)
+
+
+def decode_pyav(data, target_rate=SAMPLE_RATE):
+    """Anything FFmpeg's libraries understand (WebM/Opus included), in process"""
+    chunks = []
+    with av.open(io.BytesIO(data), mode="r") as container:
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=target_rate)
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+
+def ffmpeg_command(target_rate=SAMPLE_RATE):
+    """ffmpeg reading any container on stdin and writing float32 mono PCM to stdout.
+
+    A small probe lets output start right after the container header, which
+    streaming uploads rely on; every format the servers accept is identified
+    from its first few kilobytes.
+    """
+    return [
+        FFMPEG, "-nostdin", "-loglevel", "error",
+        "-probesize", "32768", "-analyzeduration", "0",
+        "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(target_rate),
+        "pipe:1"
+    ]
+
+
+def decode_ffmpeg(data, target_rate=SAMPLE_RATE):
+    """A fresh ffmpeg process with the upload on stdin and raw float32 PCM on stdout"""
+    completed = subprocess.run(
+        ffmpeg_command(target_rate),
+        input=data,
+        capture_output=True,
+        timeout=FFMPEG_TIMEOUT
+    )
+    if completed.returncode != 0:
+        raise DecodeError(completed.stderr.decode(errors="replace").strip() or "ffmpeg failed")
+    return np.frombuffer(completed.stdout, dtype="<f4").copy()
+
+
+def decode_tempfile(data, target_rate=SAMPLE_RATE, suffix=".webm", quality="medium"):
+    """Last resort: the old write-to-disk + librosa.load path, resampled with our filters"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+
+    try:
+        speech, sample_rate = librosa.load(temp_path, sr=None, mono=True)
+    finally:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+    return resample(speech, sample_rate, target_rate, quality)
+
+
+# Raw little-endian PCM sample formats accepted from capture clients
+PCM_FORMATS = {"s16le": "<i2", "f32le": "<f4"}
+
+# Sample rates a client may declare for raw PCM (inclusive)
+PCM_RATE_RANGE = (8000, 192000)
+
+
+def pcm_samples(data, sample_format="s16le", sample_rate=SAMPLE_RATE, channels=1,
+                target_rate=SAMPLE_RATE, quality="medium"):
+    """Float32 mono samples from raw PCM bytes without a decode step.
+
+    The body is wrapped with np.frombuffer (a view, no copy). New arrays are
+    only made where the data has to change: int16 scaling, a channel
+    mix-down and resampling when the rate differs from target_rate.
+    """
+    dtype = np.dtype(PCM_FORMATS[sample_format])
+    frame_bytes = dtype.itemsize * channels
+    if len(data) % frame_bytes:
+        raise DecodeError(
+            f"PCM body of {len(data)} bytes is not a whole number of {channels}-channel {sample_format} frames"
+        )
+
+    samples = np.frombuffer(data, dtype=dtype)
+    scale = 1 / 32768 if dtype.kind == "i" else None
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+        if scale:
+            samples *= scale
+    elif scale:
+        samples = np.multiply(samples, scale, dtype=np.float32)
+
+    return resample(samples, sample_rate, target_rate, quality)
+
+
+def sniff_format(data):
+    """Container/codec from the first bytes of an upload ("unknown" if unrecognised)"""
+    head = bytes(data[:64])
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        # The first Ogg page carries the codec's identification header
+        return "opus" if b"OpusHead" in head else "ogg"
+    if head[:4] == b"\x1aE\xdf\xa3":
+        return "webm"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # Frame sync; ADTS AAC has the MPEG layer bits at 00, MP3 never does
+        if head[1] & 0xF6 == 0xF0:
+            return "aac"
+        if head[1] & 0x06:
+            return "mp3"
+    return "unknown"
+
+
+def libsndfile_supports(audio_format):
+    """Opus needs libsndfile >= 1.0.29 and MP3 >= 1.1.0; WAV, FLAC and Vorbis always work"""
+    if sf is None or audio_format in ("webm", "mp4", "aac"):
+        return False
+    required = {"opus": (1, 0, 29), "mp3": (1, 1, 0)}.get(audio_format)
+    if required is None:
+        return True
+    try:
+        version = tuple(int(part) for part in sf.__libsndfile_version__.split("-")[0].split(".")[:3])
+    except (AttributeError, ValueError):
+        return False
+    return version >= required
+
+
+class AudioDecoder:
+    """Decode uploaded audio bytes to float32 16kHz mono without touching disk.
+
+    The upload's magic bytes pick the decode path directly: libsndfile for
+    WAV, FLAC and Ogg (and Opus, MP3 where the linked libsndfile handles
+    them), PyAV or an ffmpeg pipe for WebM, MP4 and ADTS AAC, through a
+    pool of pre-started processes when ``ffmpeg_pool`` is given. The remaining
+    paths, ending with the temp file + librosa path, are only fallbacks.
+    Attempts are counted per path, and decode latency per sniffed format.
+    ``resample_quality`` picks the resampler tier for the in-process paths;
+    ffmpeg and PyAV resample inside libswresample.
+    """
+
+    def __init__(self, target_rate=SAMPLE_RATE, ffmpeg_pool=None, resample_quality="medium"):
+        if resample_quality not in QUALITY_TIERS:
+            raise ValueError(f"Unknown resampling quality {resample_quality!r}")
+        self.target_rate = target_rate
+        self.resample_quality = resample_quality
+        self.paths = []
+        if sf is not None:
+            self.paths.append(("soundfile", functools.partial(decode_soundfile, quality=resample_quality)))
+        if av is not None:
+            self.paths.append(("pyav", decode_pyav))
+        if ffmpeg_pool is not None:
+            self.paths.append(("ffmpeg_pool", ffmpeg_pool.decode))
+        elif FFMPEG is not None:
+            self.paths.append(("ffmpeg_pipe", decode_ffmpeg))
+        self.paths.append(("tempfile", functools.partial(decode_tempfile, quality=resample_quality)))
+
+        # Decode order per format, decided once rather than per request
+        self.routes = {
+            audio_format: [
+                (name, decoder) for name, decoder in self.paths
+                if name != "soundfile" or libsndfile_supports(audio_format)
+            ]
+            for audio_format in ("wav", "flac", "ogg", "opus", "mp3", "aac", "webm", "mp4", "unknown")
+        }
+
+        self.lock = threading.Lock()
+        self.counts = {name: {"decoded": 0, "failed": 0, "seconds": 0.0} for name, _ in self.paths}
+        self.formats = {}
+
+    def record(self, name, ok, elapsed):
+        """Count one decode attempt; also used for paths outside this class (raw PCM)"""
+        with self.lock:
+            entry = self.counts.setdefault(name, {"decoded": 0, "failed": 0, "seconds": 0.0})
+            entry["decoded" if ok else "failed"] += 1
+            entry["seconds"] += elapsed
+
+    def record_format(self, audio_format, path, elapsed):
+        """Latency of one upload of a format, by the path that decoded it (None if none did)"""
+        with self.lock:
+            entry = self.formats.setdefault(audio_format, {
+                "decoded": 0,
+                "failed": 0,
+                "paths": {},
+                "latencies": collections.deque(maxlen=1000)
+            })
+            if path is None:
+                entry["failed"] += 1
+                return
+            entry["decoded"] += 1
+            entry["paths"][path] = entry["paths"].get(path, 0) + 1
+            entry["latencies"].append(elapsed)
+
+    def decode(self, data):
+        """Return (samples, path_name); raise DecodeError if every path fails"""
+        audio_format = sniff_format(data)
+        started = time.perf_counter()
+        errors = []
+
+        for name, decoder in self.routes[audio_format]:
+            attempt = time.perf_counter()
+            try:
+                samples = decoder(data, self.target_rate)
+            except Exception as e:
+                self.record(name, False, time.perf_counter() - attempt)
+                errors.append(f"{name}: {e}")
+                continue
+
+            self.record(name, True, time.perf_counter() - attempt)
+            # Format latency includes any failed attempts before this path
+            self.record_format(audio_format, name, time.perf_counter() - started)
+            return samples, name
+
+        self.record_format(audio_format, None, time.perf_counter() - started)
+        raise DecodeError(f"Could not decode {audio_format} audio (" + "; ".join(errors) + ")")
+
+    def stats(self):
+        with self.lock:
+            paths = {
+                name: {
+                    "decoded": entry["decoded"],
+                    "failed": entry["failed"],
+                    "seconds": round(entry["seconds"], 3)
+                }
+                for name, entry in self.counts.items()
+            }
+            formats = {}
+            for audio_format, entry in self.formats.items():
+                latencies = sorted(entry["latencies"])
+
+                def percentile(p):
+                    if not latencies:
+                        return None
+                    index = min(len(latencies) - 1, int(p / 100 * len(latencies)))
+                    return round(latencies[index] * 1000, 2)
+
+                formats[audio_format] = {
+                    "decoded": entry["decoded"],
+                    "failed": entry["failed"],
+                    "paths": dict(entry["paths"]),
+                    "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                    "p50_ms": percentile(50),
+                    "p95_ms": percentile(95)
+                }
+            return {"paths": paths, "formats": formats, "resample_quality": self.resample_quality}
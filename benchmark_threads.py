@@ -0,0 +1,183 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+
+SAMPLE_RATE = 16000
+
+
+def default_plans(cpus):
+    """Worker counts that are powers of two, each splitting the CPUs evenly"""
+    plans = []
+    workers = 1
+    while workers <= cpus:
+        plans.append(f"{workers}x{cpus // workers}")
+        workers *= 2
+    return plans
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_plan(args):
+    """Benchmark one thread plan in this process and print the result as JSON.
+
+    Each plan gets a fresh interpreter: torch's inter-op pool can only be
+    sized once, and pinned threads would otherwise leak into the next plan.
+    """
+    import numpy as np
+
+    from inference_pool import InferencePool
+    from model_cache import load_cached_model, resolve_cache_root
+    from model_runner import transcribe_batch
+    from thread_plan import ThreadPlan
+
+    plan = ThreadPlan.parse(args.run_plan, inter_op_threads=args.inter_op, pin=args.pin)
+    plan.apply_process()
+
+    processor, model, _ = load_cached_model(args.model, resolve_cache_root(args.cache))
+
+    if args.fixtures:
+        from check_quantization import load_fixtures
+        clips = [speech for _, speech, _ in load_fixtures(args.fixtures)]
+    else:
+        rng = np.random.default_rng(0)
+        clips = [
+            (rng.standard_normal(int(args.seconds * SAMPLE_RATE)) * 0.1).astype(np.float32)
+        ]
+
+    pool = InferencePool(
+        lambda speeches: transcribe_batch(processor, model, speeches),
+        workers=plan.workers,
+        max_queue=args.requests + plan.workers,
+        max_batch_size=args.batch,
+        max_backlog_seconds=float("inf"),
+        policy="fifo",
+        worker_init=plan.apply_worker
+    ).start()
+
+    # Warm every worker thread (allocator, OpenMP team, pinning) before timing
+    pool.run_on_each_worker(lambda: transcribe_batch(processor, model, clips[:1]))
+
+    latencies = []
+    audio_seconds = [0.0]
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            clip = clips[i % len(clips)]
+            started = time.perf_counter()
+            pool.transcribe(clip)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                audio_seconds[0] += len(clip) / SAMPLE_RATE
+
+    concurrency = args.concurrency or plan.workers * args.batch
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    print(json.dumps({
+        "plan": plan.name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "requests_per_second": len(latencies) / wall,
+        "audio_seconds_per_second": audio_seconds[0] / wall,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "oversubscribed": plan.oversubscribed()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep inference thread plans (workers x intra-op threads, pinning) "
+                    "and report throughput and p95 latency for each"
+    )
+    parser.add_argument("fixtures", nargs="*",
+                        help="audio files to transcribe; synthetic noise clips by default")
+    parser.add_argument("--plans",
+                        help='comma-separated "WORKERSxTHREADS" plans, default: powers of two over all CPUs')
+    parser.add_argument("--pin", choices=["off", "on", "both"], default="both")
+    parser.add_argument("--inter-op", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="concurrent clients, default workers x batch")
+    parser.add_argument("--batch", type=int, default=1, help="max micro-batch size")
+    parser.add_argument("--seconds", type=float, default=3.0, help="synthetic clip length")
+    parser.add_argument("--model", default="facebook/wav2vec2-base-960h")
+    parser.add_argument("--cache", help='defaults to the shared model cache; "off" loads from the hub')
+    parser.add_argument("--run-plan", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_plan:
+        args.pin = args.pin == "on"
+        run_plan(args)
+        return
+
+    from thread_plan import available_cpus
+    cpus = len(available_cpus())
+    plans = args.plans.split(",") if args.plans else default_plans(cpus)
+    pin_modes = {"off": ["off"], "on": ["on"], "both": ["off", "on"]}[args.pin]
+
+    print(f"🧵 Sweeping {len(plans) * len(pin_modes)} thread plans on {cpus} CPUs ({args.requests} requests each)")
+    results = []
+    for spec in plans:
+        for pin in pin_modes:
+            command = [
+                sys.executable, os.path.abspath(__file__), *args.fixtures,
+                "--run-plan", spec.strip(), "--pin", pin,
+                "--inter-op", str(args.inter_op), "--requests", str(args.requests),
+                "--concurrency", str(args.concurrency), "--batch", str(args.batch),
+                "--seconds", str(args.seconds), "--model", args.model
+            ]
+            if args.cache:
+                command += ["--cache", args.cache]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"❌ Plan {spec} (pin {pin}) failed:\n{completed.stderr[-2000:]}")
+                continue
+
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"✅ {result['plan']}: {result['requests_per_second']:.2f} req/s | p95 {result['p95']:.3f}s")
+
+    if not results:
+        print("❌ No plan completed")
+        return
+
+    print(f"\n{'plan':<18}{'req/s':>9}{'audio x':>9}{'p50 s':>9}{'p95 s':>9}")
+    for result in sorted(results, key=lambda r: -r["requests_per_second"]):
+        flag = " (oversubscribed)" if result["oversubscribed"] else ""
+        print(
+            f"{result['plan']:<18}{result['requests_per_second']:>9.2f}"
+            f"{result['audio_seconds_per_second']:>9.2f}{result['p50']:>9.3f}{result['p95']:>9.3f}{flag}"
+        )
+
+    best = max(results, key=lambda r: r["requests_per_second"])
+    print(
+        f"\n🏆 Highest throughput: {best['plan']}"
+        " — set GREENVOICE_WORKERS, GREENVOICE_INTRA_OP_THREADS and GREENVOICE_PIN_CPUS to match"
+    )
+
+
+if __name__ == "__main__":
+    main()
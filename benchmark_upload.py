@@ -0,0 +1,104 @@
+import argparse
+import base64
+import json
+import mimetypes
+import os
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+
+from uploads import parse_upload
+
+BOUNDARY = "----GreenVoiceBenchmarkBoundary"
+
+
+def encode_json(audio):
+    body = json.dumps({"audio": base64.b64encode(audio).decode("ascii"), "format": "wav"}).encode()
+    return body, "application/json"
+
+
+def encode_multipart(audio, mime_type):
+    body = b"".join([
+        f"--{BOUNDARY}\r\n".encode(),
+        b'Content-Disposition: form-data; name="audio"; filename="recording"\r\n',
+        f"Content-Type: {mime_type}\r\n\r\n".encode(),
+        audio,
+        f"\r\n--{BOUNDARY}--\r\n".encode()
+    ])
+    return body, f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def encode_raw(audio, mime_type):
+    return audio, mime_type
+
+
+def measure_parse(body, content_type, runs):
+    """Server-side CPU seconds per parse and peak extra memory while parsing"""
+    started = time.process_time()
+    for _ in range(runs):
+        parse_upload(body, content_type)
+    cpu = (time.process_time() - started) / runs
+
+    tracemalloc.start()
+    parse_upload(body, content_type)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def measure_request(url, body, content_type):
+    request = urllib.request.Request(
+        url, data=body, method="POST", headers={"Content-Type": content_type}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - started, status
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare /api/transcribe upload encodings: bytes on the wire and "
+                    "server CPU to turn the body back into audio bytes"
+    )
+    parser.add_argument("audio", nargs="?", default="speech.wav")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--url", help="also POST each encoding to a running server, "
+                                      "e.g. http://localhost:5555/api/transcribe")
+    args = parser.parse_args()
+
+    with open(args.audio, "rb") as f:
+        audio = f.read()
+    mime_type = mimetypes.guess_type(args.audio)[0] or "application/octet-stream"
+
+    encodings = [
+        ("json+base64", *encode_json(audio)),
+        ("multipart", *encode_multipart(audio, mime_type)),
+        ("raw", *encode_raw(audio, mime_type))
+    ]
+
+    print(f"🎵 {os.path.basename(args.audio)}: {len(audio)} bytes ({mime_type})")
+    header = f"\n{'encoding':<14}{'body bytes':>12}{'overhead':>10}{'parse CPU ms':>14}{'peak MB':>10}"
+    if args.url:
+        header += f"{'request s':>11}{'status':>8}"
+    print(header)
+
+    for name, body, content_type in encodings:
+        cpu, peak = measure_parse(body, content_type, args.runs)
+        line = (
+            f"{name:<14}{len(body):>12}{(len(body) / len(audio) - 1) * 100:>9.1f}%"
+            f"{cpu * 1000:>14.3f}{peak / 1e6:>10.2f}"
+        )
+        if args.url:
+            elapsed, status = measure_request(args.url, body, content_type)
+            line += f"{elapsed:>11.3f}{status:>8}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import mmap
+import struct
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE, DecodeError, libsndfile_supports, sf, sniff_format
+from resampler import BlockResampler
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> sample dtype that can be viewed in place
+WAV_DTYPES = {
+    (WAVE_FORMAT_PCM, 16): "<i2",
+    (WAVE_FORMAT_PCM, 32): "<i4",
+    (WAVE_FORMAT_IEEE_FLOAT, 32): "<f4",
+    (WAVE_FORMAT_IEEE_FLOAT, 64): "<f8",
+}
+
+
+def wav_layout(view):
+    """(dtype, channels, sample_rate, data_offset, data_bytes) of a WAV file, None if it can't be viewed in place"""
+    if len(view) < 12 or view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    position = 12
+    try:
+        while position + 8 <= len(view):
+            chunk_id = view[position:position + 4]
+            size = struct.unpack_from("<I", view, position + 4)[0]
+            body = position + 8
+
+            if chunk_id == b"fmt ":
+                tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+                if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    # The real format is the first two bytes of the SubFormat GUID
+                    tag = struct.unpack_from("<H", view, body + 24)[0]
+                fmt = (WAV_DTYPES.get((tag, bits)), channels, sample_rate)
+
+            elif chunk_id == b"data":
+                if fmt is None or fmt[0] is None or fmt[1] == 0:
+                    return None
+                # Recorders that never went back to patch the header leave 0 or
+                # 0xFFFFFFFF; the samples then run to the end of the file
+                if size in (0, 0xFFFFFFFF) or body + size > len(view):
+                    size = len(view) - body
+                return (*fmt, body, size)
+
+            position = body + size + (size & 1)
+    except struct.error:
+        # Header cut short (or longer than the bytes we were given)
+        return None
+    return None
+
+
+def iter_wav_blocks(path, block_seconds=10, target_rate=SAMPLE_RATE, quality="medium"):
+    """16kHz mono chunks of an uncompressed WAV, read through a memory map.
+
+    Samples are viewed in place in the mapping, one block is converted to
+    float32 at a time, and pages already read are handed back to the kernel,
+    so resident memory stays around one block however long the file is.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    frames = part = None
+    try:
+        layout = wav_layout(mapped)
+        if layout is None:
+            raise DecodeError(f"{path} is not a PCM/float WAV file")
+        dtype, channels, sample_rate, offset, data_bytes = layout
+        dtype = np.dtype(dtype)
+
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        count = data_bytes // (dtype.itemsize * channels)
+        frames = np.frombuffer(mapped, dtype=dtype, count=count * channels, offset=offset).reshape(count, channels)
+        scale = 1 / 2 ** (8 * dtype.itemsize - 1) if dtype.kind == "i" else None
+
+        resampler = BlockResampler(sample_rate, target_rate, quality)
+        block = max(1, int(block_seconds * sample_rate))
+        released = 0
+
+        for start in range(0, count, block):
+            part = frames[start:start + block]
+            # Always a new array: nothing yielded may point into the mapping
+            if channels > 1:
+                samples = part.mean(axis=1, dtype=np.float32)
+            else:
+                samples = part[:, 0].astype(np.float32)
+            if scale:
+                samples *= scale
+
+            output = resampler.process(samples)
+            if len(output):
+                yield output
+
+            if hasattr(mmap, "MADV_DONTNEED"):
+                done = (offset + (start + len(part)) * dtype.itemsize * channels) // mmap.PAGESIZE * mmap.PAGESIZE
+                if done > released:
+                    mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+
+        tail = resampler.flush()
+        if len(tail):
+            yield tail
+    finally:
+        # The array views must go before the mapping can be closed
+        frames = part = None
+        mapped.close()
+
+
+def iter_soundfile_blocks(path, block_seconds=10, target_rate=SAMPLE_RATE, quality="medium"):
+    """16kHz mono chunks of a file libsndfile can decode (FLAC, Ogg, ...), one block at a time"""
+    try:
+        info = sf.info(path)
+        blocks = sf.blocks(path, blocksize=max(1, int(block_seconds * info.samplerate)),
+                           dtype="float32", always_2d=True)
+        resampler = BlockResampler(info.samplerate, target_rate, quality)
+
+        for part in blocks:
+            samples = part.mean(axis=1, dtype=np.float32) if part.shape[1] > 1 else part[:, 0]
+            output = resampler.process(samples)
+            if len(output):
+                yield output
+    except RuntimeError as e:
+        # libsndfile errors (LibsndfileError is a RuntimeError)
+        raise DecodeError(f"Could not read {path}: {e}")
+
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
+
+
+def iter_audio_blocks(path, block_seconds=10, target_rate=SAMPLE_RATE, quality="medium"):
+    """16kHz mono float32 chunks of a seekable audio file with memory bounded by the block size.
+
+    Uncompressed WAV is memory-mapped; other formats libsndfile reads
+    (FLAC, Ogg/Vorbis and so on) are decoded block by block. Formats that
+    only ffmpeg understands raise DecodeError.
+    """
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    audio_format = sniff_format(head)
+
+    if audio_format == "wav" and wav_layout(head) is not None:
+        return iter_wav_blocks(path, block_seconds, target_rate, quality)
+    if libsndfile_supports(audio_format) and audio_format != "unknown":
+        return iter_soundfile_blocks(path, block_seconds, target_rate, quality)
+    raise DecodeError(f"{audio_format} audio cannot be read in blocks; use WAV or FLAC")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import tempfile
+
+from compiled_backend import CompiledBackend, validate_compiled
+from model_cache import cache_path, load_cached_model, resolve_cache_root
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile Wav2Vec2ForCTC with torch.compile and check logits parity with eager"
+    )
+    parser.add_argument("--model", default="facebook/wav2vec2-base-960h")
+    parser.add_argument("--cache", help='defaults to the shared model cache; "off" loads from the hub')
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    parser.add_argument("--batch-sizes", default="1")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="largest allowed absolute logit difference")
+    args = parser.parse_args()
+
+    print(f"🌿 Loading {args.model}...")
+    cache_root = resolve_cache_root(args.cache)
+    processor, model, _ = load_cached_model(args.model, cache_root)
+    with_attention_mask = bool(processor.feature_extractor.return_attention_mask)
+
+    cache_dir = (
+        os.path.join(cache_path(cache_root, args.model), "inductor")
+        if cache_root is not None else tempfile.mkdtemp(prefix="inductor-")
+    )
+    backend = CompiledBackend(
+        model,
+        cache_dir=cache_dir,
+        max_seconds=args.max_seconds,
+        batch_sizes=[int(x) for x in args.batch_sizes.split(",") if x.strip()]
+    )
+
+    print(f"⚙️ Compiling (attention_mask={with_attention_mask})...")
+    backend.precompile(with_attention_mask=with_attention_mask)
+    if backend.error:
+        print(f"❌ Compilation failed: {backend.error}")
+        sys.exit(1)
+
+    print("🔍 Checking logits parity with eager...")
+    passed = True
+    for result in validate_compiled(model, backend, with_attention_mask=with_attention_mask):
+        if result["error"]:
+            passed = False
+            print(f"❌ shape={result['shape']} | recompiled or failed: {result['error']}")
+            continue
+
+        ok = result["compiled"] and result["max_abs_diff"] <= args.tolerance
+        passed = passed and ok
+        print(
+            f"{'✅' if ok else '❌'} shape={result['shape']}"
+            f" | compiled={result['compiled']}"
+            f" | max_abs_diff={result['max_abs_diff']:.2e}"
+            f" | argmax_agreement={result['argmax_agreement']:.4f}"
+        )
+
+    if not passed:
+        print(f"❌ Parity check failed (tolerance {args.tolerance:g})")
+        sys.exit(1)
+
+    print("🎉 Compiled graph matches eager; start the server with GREENVOICE_BACKEND=compiled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import math
+import time
+
+from check_quantization import SAMPLE_RATE, load_fixtures, word_error_rate
+from model_cache import load_cached_model, resolve_cache_root
+from model_runner import transcribe_batch, transcribe_long
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare long-form (windowed, stride-stitched) transcription with a "
+                    "single pass over the whole clip"
+    )
+    parser.add_argument("fixtures", nargs="*", default=["speech.wav"])
+    parser.add_argument("--model", default="facebook/wav2vec2-base-960h")
+    parser.add_argument("--cache", help='defaults to the shared model cache; "off" loads from the hub')
+    parser.add_argument("--window", type=float, default=30,
+                        help="window seconds; set it below the clip length to force several windows")
+    parser.add_argument("--stride", type=float, default=5)
+    parser.add_argument("--batch", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"🌿 Loading {args.model}...")
+    processor, model, _ = load_cached_model(args.model, resolve_cache_root(args.cache))
+
+    print(f"\n{'fixture':<28}{'audio s':>9}{'windows':>9}{'single s':>10}{'long s':>9}{'WER vs single':>15}")
+    for name, speech, _ in load_fixtures(args.fixtures):
+        duration = len(speech) / SAMPLE_RATE
+
+        started = time.perf_counter()
+        single = transcribe_batch(processor, model, [speech])[0].strip()
+        single_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        long_form = transcribe_long(
+            processor, model, speech,
+            window_seconds=args.window,
+            stride_seconds=args.stride,
+            batch_size=args.batch
+        ).strip()
+        long_time = time.perf_counter() - started
+
+        step = args.window - 2 * args.stride
+        windows = 1 if duration <= args.window else math.ceil((duration - args.window) / step) + 1
+        print(
+            f"{name[:27]:<28}{duration:>9.2f}{windows:>9}{single_time:>10.3f}{long_time:>9.3f}"
+            f"{word_error_rate(single, long_form):>15.3f}"
+        )
+        if long_form != single:
+            print(f"   single: {single}")
+            print(f"   long:   {long_form}")
+
+    print(f"\n✅ Window {args.window:g}s, stride {args.stride:g}s; clips up to one window take the single-pass path")
+
+
+if __name__ == "__main__":
+    main()
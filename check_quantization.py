@@ -0,0 +1,138 @@
+import argparse
+import glob
+import os
+import time
+
+import librosa
+import numpy as np
+
+from model_cache import load_cached_model, resolve_cache_root
+from model_runner import quantize_model, transcribe_batch
+
+SAMPLE_RATE = 16000
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = reference.upper().split()
+    hyp = hypothesis.upper().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+
+    return previous[-1] / len(ref)
+
+
+def load_fixtures(paths):
+    """Audio files plus optional same-named .txt references"""
+    fixtures = []
+    for path in paths:
+        speech, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+        max_amp = np.max(np.abs(speech)) if len(speech) else 0
+        if max_amp > 0:
+            speech = speech / max_amp
+
+        reference = None
+        text_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.isfile(text_path):
+            with open(text_path) as f:
+                reference = f.read().strip()
+
+        fixtures.append((os.path.basename(path), speech, reference))
+    return fixtures
+
+
+def timed_transcribe(processor, model, speech, runs):
+    """Best-of-N wall time, so one scheduler hiccup does not skew the comparison"""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = transcribe_batch(processor, model, [speech])[0].strip()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return text, best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare WER and speed of int8-quantized Wav2Vec2 against fp32"
+    )
+    parser.add_argument(
+        "fixtures", nargs="*", default=["speech.wav"],
+        help="audio files or directories; a same-named .txt file is the reference "
+             "transcript, otherwise the fp32 output is used as the reference"
+    )
+    parser.add_argument("--model", default="facebook/wav2vec2-base-960h")
+    parser.add_argument("--cache", help='defaults to the shared model cache; "off" loads from the hub')
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = []
+    for entry in args.fixtures:
+        if os.path.isdir(entry):
+            for pattern in ("*.wav", "*.flac", "*.webm", "*.ogg", "*.mp3"):
+                paths.extend(sorted(glob.glob(os.path.join(entry, pattern))))
+        else:
+            paths.append(entry)
+
+    print(f"🌿 Loading {args.model}...")
+    processor, fp32_model, _ = load_cached_model(args.model, resolve_cache_root(args.cache))
+    print("🗜️ Quantizing to int8...")
+    int8_model = quantize_model(fp32_model)
+
+    fixtures = load_fixtures(paths)
+    totals = {"audio": 0.0, "fp32": 0.0, "int8": 0.0, "fp32_wer": 0.0, "int8_wer": 0.0}
+
+    print(f"\n{'fixture':<28}{'audio s':>9}{'fp32 s':>9}{'int8 s':>9}{'speedup':>9}{'fp32 WER':>10}{'int8 WER':>10}")
+    for name, speech, reference in fixtures:
+        fp32_text, fp32_time = timed_transcribe(processor, fp32_model, speech, args.runs)
+        int8_text, int8_time = timed_transcribe(processor, int8_model, speech, args.runs)
+
+        if reference is None:
+            reference = fp32_text
+        fp32_wer = word_error_rate(reference, fp32_text)
+        int8_wer = word_error_rate(reference, int8_text)
+        duration = len(speech) / SAMPLE_RATE
+
+        totals["audio"] += duration
+        totals["fp32"] += fp32_time
+        totals["int8"] += int8_time
+        totals["fp32_wer"] += fp32_wer * duration
+        totals["int8_wer"] += int8_wer * duration
+
+        print(
+            f"{name[:27]:<28}{duration:>9.2f}{fp32_time:>9.3f}{int8_time:>9.3f}"
+            f"{fp32_time / int8_time:>8.2f}x{fp32_wer:>10.3f}{int8_wer:>10.3f}"
+        )
+        if int8_text != fp32_text:
+            print(f"   fp32: {fp32_text}")
+            print(f"   int8: {int8_text}")
+
+    if totals["audio"] == 0:
+        print("❌ No fixtures found")
+        return
+
+    print(
+        f"\n✅ Total {totals['audio']:.1f}s audio"
+        f" | fp32 {totals['fp32']:.2f}s (RTF {totals['fp32'] / totals['audio']:.3f})"
+        f" | int8 {totals['int8']:.2f}s (RTF {totals['int8'] / totals['audio']:.3f})"
+        f" | speedup {totals['fp32'] / totals['int8']:.2f}x"
+    )
+    print(
+        f"📊 Duration-weighted WER | fp32 {totals['fp32_wer'] / totals['audio']:.3f}"
+        f" | int8 {totals['int8_wer'] / totals['audio']:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+
+import torch
+
+from model_runner import TorchBackend
+
+
+def mark_sample_axis_dynamic(tensor, min_samples, max_samples):
+    """Let the compiled graph take any clip length in [min_samples, max_samples] unpadded"""
+    try:
+        torch._dynamo.mark_dynamic(tensor, 1, min=min_samples, max=max_samples)
+    except TypeError:
+        # Older torch: no bounds, the axis is simply dynamic
+        torch._dynamo.mark_dynamic(tensor, 1)
+
+
+class CompiledBackend(TorchBackend):
+    """Wav2Vec2 forward pass compiled with torch.compile for short clips.
+
+    One graph is compiled per batch size with the sample axis left dynamic
+    between ``min_seconds`` and ``max_seconds`` (the short-clip range where
+    eager per-op overhead dominates), so clips run at their real length and
+    the logits match eager. Nothing is padded: without an attention mask,
+    as on base-960h, padding would change the GroupNorm statistics and the
+    attention. Longer clips, and anything not compiled yet, run eager.
+    Generated kernels go to Inductor's on-disk FX graph cache under
+    ``cache_dir``, so a restart re-traces but skips code generation and C++
+    compilation. Unlike saving traced TorchScript modules, the cache holds
+    no copy of the weights.
+    """
+
+    name = "compiled"
+
+    def __init__(self, model, cache_dir, min_seconds=0.1, max_seconds=3.0, batch_sizes=(1,),
+                 sampling_rate=16000):
+        super().__init__(model)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ["TORCHINDUCTOR_CACHE_DIR"] = cache_dir
+        os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"] = "1"
+        try:
+            import torch._inductor.config as inductor_config
+            inductor_config.fx_graph_cache = True
+        except (ImportError, AttributeError):
+            pass
+
+        self.cache_dir = cache_dir
+        self.min_samples = max(400, int(min_seconds * sampling_rate))
+        self.max_samples = int(max_seconds * sampling_rate)
+        self.batch_sizes = sorted({int(b) for b in batch_sizes})
+        self.sampling_rate = sampling_rate
+
+        # One dynamic-length graph per (batch, mask) pair
+        torch._dynamo.config.cache_size_limit = max(
+            torch._dynamo.config.cache_size_limit,
+            2 * len(self.batch_sizes) + 2
+        )
+        self.compiled = torch.compile(self._forward)
+
+        self.lock = threading.Lock()
+        self.ready = set()
+        self.compile_seconds = {}
+        self.error = None
+        self.hits = 0
+        self.misses = 0
+
+    def _forward(self, input_values, attention_mask):
+        if attention_mask is None:
+            return self.model(input_values).logits
+        return self.model(input_values, attention_mask=attention_mask).logits
+
+    def _run_compiled(self, input_values, attention_mask):
+        mark_sample_axis_dynamic(input_values, self.min_samples, self.max_samples)
+        if attention_mask is not None:
+            mark_sample_axis_dynamic(attention_mask, self.min_samples, self.max_samples)
+        with torch.no_grad():
+            return self.compiled(input_values, attention_mask)
+
+    def precompile(self, with_attention_mask=False):
+        """Compile one graph per batch size (runs during warm-up, before readiness)"""
+        for batch_size in self.batch_sizes:
+            key = (batch_size, with_attention_mask)
+            started = time.monotonic()
+            try:
+                # Two lengths: the second confirms the graph really is length-generic
+                for samples in (self.max_samples, self.min_samples):
+                    input_values = torch.zeros(batch_size, samples)
+                    attention_mask = None
+                    if with_attention_mask:
+                        attention_mask = torch.ones(batch_size, samples, dtype=torch.long)
+                    self._run_compiled(input_values, attention_mask)
+            except Exception as e:
+                # Leave the backend usable: everything simply runs eager
+                print(f"⚠️ Compilation failed, staying eager: {e}")
+                self.error = str(e)
+                return
+
+            elapsed = time.monotonic() - started
+            name = f"{batch_size}x{self.min_samples / self.sampling_rate:g}-{self.max_samples / self.sampling_rate:g}s"
+            self.compile_seconds[name] = round(elapsed, 3)
+            self.ready.add(key)
+            print(f"⚙️ Compiled {name} in {elapsed:.2f}s")
+
+    def forward_logits(self, input_values, attention_mask=None):
+        batch_size, samples = input_values.shape
+        key = (batch_size, attention_mask is not None)
+
+        if key not in self.ready or not self.min_samples <= samples <= self.max_samples:
+            with self.lock:
+                self.misses += 1
+            return super().forward_logits(input_values, attention_mask)
+
+        with self.lock:
+            self.hits += 1
+        return self._run_compiled(input_values, attention_mask)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                "backend": self.name,
+                "cache_dir": self.cache_dir,
+                "compiled_range_seconds": [
+                    self.min_samples / self.sampling_rate, self.max_samples / self.sampling_rate
+                ],
+                "hits": self.hits,
+                "misses": self.misses,
+                "compiled_shapes": dict(self.compile_seconds),
+                "error": self.error
+            }
+
+        try:
+            from torch._dynamo.utils import counters
+            stats["inductor_fx_cache"] = {
+                "hits": counters["inductor"].get("fxgraph_cache_hit", 0),
+                "misses": counters["inductor"].get("fxgraph_cache_miss", 0)
+            }
+        except (ImportError, AttributeError):
+            pass
+
+        return stats
+
+
+def validate_compiled(model, backend, lengths_seconds=None, with_attention_mask=False, seed=0):
+    """Compare compiled logits to eager on random clips inside the compiled range.
+
+    ``lengths_seconds`` defaults to three uneven lengths spread over the range.
+    Returns one dict per shape with the max absolute logit difference, the
+    fraction of frames whose argmax token agrees, and whether the compiled
+    graph actually served the call. Recompiling is an error while this runs,
+    so a length the precompiled graph does not cover (which would recompile
+    on the request path, or fall back to eager once dynamo's cache is full)
+    shows up as ``compiled: False`` with the reason in ``error``.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    results = []
+    if lengths_seconds is None:
+        top = backend.max_samples / backend.sampling_rate
+        lengths_seconds = (0.17 * top, 0.43 * top, 0.97 * top)
+
+    error_on_recompile = torch._dynamo.config.error_on_recompile
+    torch._dynamo.config.error_on_recompile = True
+    try:
+        for batch_size in backend.batch_sizes:
+            for seconds in lengths_seconds:
+                samples = int(seconds * backend.sampling_rate)
+                input_values = torch.randn(batch_size, samples, generator=generator)
+                attention_mask = None
+                if with_attention_mask:
+                    attention_mask = torch.ones(batch_size, samples, dtype=torch.long)
+
+                with torch.no_grad():
+                    if attention_mask is None:
+                        expected = model(input_values).logits
+                    else:
+                        expected = model(input_values, attention_mask=attention_mask).logits
+
+                result = {"shape": [batch_size, samples], "compiled": False, "error": None,
+                          "max_abs_diff": None, "argmax_agreement": None}
+                results.append(result)
+
+                hits = backend.hits
+                try:
+                    actual = backend.forward_logits(input_values, attention_mask)
+                except Exception as e:
+                    message = str(e).strip()
+                    result["error"] = message.splitlines()[0] if message else type(e).__name__
+                    continue
+
+                result.update({
+                    "compiled": backend.hits > hits,
+                    "max_abs_diff": float((expected - actual).abs().max()),
+                    "argmax_agreement": float(
+                        (expected.argmax(dim=-1) == actual.argmax(dim=-1)).float().mean()
+                    )
+                })
+    finally:
+        torch._dynamo.config.error_on_recompile = error_on_recompile
+
+    return results
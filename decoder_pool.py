@@ -0,0 +1,131 @@
+import collections
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from audio_decode import FFMPEG, SAMPLE_RATE, DecodeError, ffmpeg_command
+
+
+class DecoderPool:
+    """Pre-started ffmpeg processes waiting on their stdin pipes.
+
+    An ffmpeg process decodes exactly one input, so the pool keeps ``size``
+    spare processes spawned ahead of time by a background thread. A job
+    takes a warm process, pipes compressed bytes in and raw 16kHz PCM out,
+    and the thread replaces it. Idle processes that die are dropped and
+    respawned, and a job that runs past ``timeout`` has its process killed.
+    """
+
+    def __init__(self, size=2, target_rate=SAMPLE_RATE, timeout=30, check_interval=5.0):
+        if FFMPEG is None:
+            raise DecodeError("ffmpeg is not installed")
+
+        self.size = max(1, int(size))
+        self.target_rate = target_rate
+        self.timeout = timeout
+        self.check_interval = check_interval
+
+        self.idle = collections.deque()
+        self.condition = threading.Condition()
+        self.thread = None
+
+        self.warm = 0
+        self.cold = 0
+        self.crashed = 0
+        self.timeouts = 0
+        self.failed = 0
+        self.spawned = 0
+        self.spawn_seconds = 0.0
+
+    def start(self):
+        """Start the refill thread; call in each pre-fork worker, never in the parent"""
+        self.thread = threading.Thread(target=self._refill_loop, name="ffmpeg-pool", daemon=True)
+        self.thread.start()
+        print(f"🎞️ ffmpeg decoder pool started | size={self.size} | timeout={self.timeout}s")
+        return self
+
+    def _spawn(self):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            ffmpeg_command(self.target_rate),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        with self.condition:
+            self.spawned += 1
+            self.spawn_seconds += time.perf_counter() - started
+        return process
+
+    def _refill_loop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self.idle) < self.size, timeout=self.check_interval)
+
+                # Drop spares that exited on their own before anyone used them
+                alive = [process for process in self.idle if process.poll() is None]
+                self.crashed += len(self.idle) - len(alive)
+                self.idle = collections.deque(alive)
+                missing = self.size - len(self.idle)
+
+            for _ in range(missing):
+                try:
+                    process = self._spawn()
+                except OSError as e:
+                    print(f"⚠️ Could not start ffmpeg: {e}")
+                    time.sleep(self.check_interval)
+                    break
+                with self.condition:
+                    self.idle.append(process)
+
+    def acquire(self):
+        """A running ffmpeg process ready for one input, spawning one only if none is idle"""
+        with self.condition:
+            while self.idle:
+                process = self.idle.popleft()
+                if process.poll() is None:
+                    self.warm += 1
+                    self.condition.notify()
+                    return process
+                self.crashed += 1
+            self.cold += 1
+            self.condition.notify()
+
+        return self._spawn()
+
+    def decode(self, data, target_rate=SAMPLE_RATE):
+        """Decode a whole upload to float32 mono PCM through a pooled process"""
+        if target_rate != self.target_rate:
+            raise DecodeError(f"Pool decodes to {self.target_rate}Hz, not {target_rate}Hz")
+
+        process = self.acquire()
+        try:
+            stdout, stderr = process.communicate(data, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            with self.condition:
+                self.timeouts += 1
+            raise DecodeError(f"ffmpeg took longer than {self.timeout}s")
+
+        if process.returncode != 0:
+            with self.condition:
+                self.failed += 1
+            raise DecodeError(stderr.decode(errors="replace").strip() or "ffmpeg failed")
+        return np.frombuffer(stdout, dtype="<f4")
+
+    def stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "warm_jobs": self.warm,
+                "cold_spawns": self.cold,
+                "crashed_idle": self.crashed,
+                "timeouts": self.timeouts,
+                "failed": self.failed,
+                "spawned": self.spawned,
+                "mean_spawn_ms": round(self.spawn_seconds / self.spawned * 1000, 2) if self.spawned else None
+            }
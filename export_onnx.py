@@ -0,0 +1,58 @@
+import argparse
+import sys
+import time
+
+from model_cache import DEFAULT_CACHE_ROOT, load_cached_model, resolve_cache_root
+from onnx_backend import OnnxBackend, default_onnx_path, export_onnx, validate_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export Wav2Vec2ForCTC to ONNX and check logits parity with PyTorch"
+    )
+    parser.add_argument("--model", default="facebook/wav2vec2-base-960h")
+    parser.add_argument("--cache", help='defaults to the shared model cache; "off" loads from the hub')
+    parser.add_argument("--output", help="defaults to model.onnx inside the model cache")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="largest allowed absolute logit difference")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="skip the export and only check an existing graph")
+    args = parser.parse_args()
+
+    cache_root = resolve_cache_root(args.cache)
+    output = args.output or default_onnx_path(cache_root or DEFAULT_CACHE_ROOT, args.model)
+
+    print(f"🌿 Loading {args.model}...")
+    processor, model, _ = load_cached_model(args.model, cache_root)
+    with_attention_mask = bool(processor.feature_extractor.return_attention_mask)
+
+    if not args.validate_only:
+        print(f"📤 Exporting to {output} (opset {args.opset}, attention_mask={with_attention_mask})...")
+        started = time.monotonic()
+        export_onnx(model, output, with_attention_mask=with_attention_mask, opset=args.opset)
+        print(f"✅ Exported in {time.monotonic() - started:.1f}s")
+
+    print("🔍 Checking logits parity with PyTorch...")
+    backend = OnnxBackend(output, model.config)
+    results = validate_onnx(model, backend)
+
+    passed = True
+    for result in results:
+        ok = result["max_abs_diff"] <= args.tolerance
+        passed = passed and ok
+        print(
+            f"{'✅' if ok else '❌'} shape={result['shape']}"
+            f" | max_abs_diff={result['max_abs_diff']:.2e}"
+            f" | argmax_agreement={result['argmax_agreement']:.4f}"
+        )
+
+    if not passed:
+        print(f"❌ Parity check failed (tolerance {args.tolerance:g})")
+        sys.exit(1)
+
+    print("🎉 ONNX graph matches PyTorch; start the server with GREENVOICE_BACKEND=onnx")
+
+
+if __name__ == "__main__":
+    main()
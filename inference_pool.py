@@ -0,0 +1,506 @@
+import collections
+import heapq
+import itertools
+import math
+import threading
+import time
+import traceback
+
+
+class PoolFullError(Exception):
+    """Raised when the inference queue cannot take another job"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobCancelled(Exception):
+    """Raised when a job is dropped because its deadline passed or its client left"""
+
+    def __init__(self, reason):
+        super().__init__(f"Transcription cancelled ({reason})")
+        self.reason = reason
+
+
+class InferenceJob:
+    """One unit of model work plus the slot its result is delivered to.
+
+    ``deadline`` is a ``time.monotonic()`` timestamp and ``is_disconnected`` a
+    callable returning True once nobody is waiting for the result; either one
+    makes ``cancel_reason()`` report why the job should be dropped.
+    """
+
+    def __init__(self, audio, duration, deadline=None, is_disconnected=None):
+        self.audio = audio
+        self.duration = duration
+        self.deadline = deadline
+        self.is_disconnected = is_disconnected
+        self.submitted = time.monotonic()
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.callbacks = []
+        self.callback_lock = threading.Lock()
+
+    def add_done_callback(self, callback):
+        """Call ``callback(job)`` once the job finishes (immediately if it already has)"""
+        with self.callback_lock:
+            if not self.done.is_set():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+
+    def cancel_reason(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        if self.is_disconnected is not None and self.is_disconnected():
+            return "disconnect"
+        return None
+
+    def check(self):
+        """Raise JobCancelled if the job should stop; long jobs call this between chunks"""
+        reason = self.cancel_reason()
+        if reason is not None:
+            raise JobCancelled(reason)
+
+    def finish(self, result=None, error=None):
+        with self.callback_lock:
+            self.result = result
+            self.error = error
+            self.done.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class DurationBucket:
+    """Queue and stats for clips whose duration falls in [low, high)"""
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+        # Heap of (priority, sequence, job); see InferencePool.priority
+        self.jobs = []
+        self.batches = 0
+        self.completed = 0
+        self.real_samples = 0
+        self.padded_samples = 0
+        self.latencies = collections.deque(maxlen=500)
+
+    @property
+    def name(self):
+        if self.low == 0:
+            return f"<{self.high:g}s"
+        if self.high == float("inf"):
+            return f">{self.low:g}s"
+        return f"{self.low:g}-{self.high:g}s"
+
+    def record_batch(self, batch):
+        lengths = [len(job.audio) for job in batch]
+        self.batches += 1
+        self.real_samples += sum(lengths)
+        self.padded_samples += max(lengths) * len(lengths)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        padding_ratio = 0.0
+        if self.padded_samples:
+            padding_ratio = 1 - self.real_samples / self.padded_samples
+
+        return {
+            "bucket": self.name,
+            "queued": sum(1 for _, _, job in self.jobs if job.state == "queued"),
+            "batches": self.batches,
+            "completed": self.completed,
+            "padding_ratio": round(padding_ratio, 4),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95)
+            }
+        }
+
+
+class InferencePool:
+    """Fixed set of model worker threads fed from a bounded job queue.
+
+    HTTP handler threads decode audio concurrently and hand the model call to
+    this pool, so static files and health checks never wait behind inference.
+    Each worker gathers jobs that arrive within ``max_wait_ms`` of the first
+    one and runs them as a single batch through ``run_batch``, which takes a
+    list of clips and returns one result per clip in the same order. A result
+    that is an exception fails just that job; ``running_jobs()`` gives
+    ``run_batch`` the jobs it is working on, so long clips can ``check()``
+    between chunks.
+
+    Jobs are split into duration buckets (upper bounds in seconds, the last
+    bucket is open-ended) and a batch only ever holds clips from one bucket,
+    so short voice commands are not padded out to the length of an upload.
+
+    With the ``"sjf"`` policy the next job is the one with the shortest
+    audio, credited ``aging`` seconds for every second it has waited so long
+    uploads are not starved; ``"fifo"`` serves strictly in arrival order.
+
+    Jobs whose deadline passes or whose client disconnects are dropped from
+    the queue and counted per reason in ``cancelled``.
+
+    Admission is decided on audio-seconds rather than request count: new
+    work is always taken while a worker is idle, and otherwise refused once
+    the audio waiting in the queue passes ``max_backlog_seconds``. Clips
+    already running never count against it, so one long upload does not
+    lock everyone else out. The retry hint combines the queue with the
+    estimated work left on each worker, from a measured real-time factor.
+    """
+
+    def __init__(self, run_batch, workers=2, max_queue=8, max_batch_size=8, max_wait_ms=10,
+                 bucket_bounds=(3, 10, 30), sample_rate=16000, max_backlog_seconds=120,
+                 policy="sjf", aging=1.0, worker_init=None):
+        if policy not in ("sjf", "fifo"):
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+
+        self.run_batch = run_batch
+        # Called as worker_init(index) on each worker thread before it takes work
+        self.worker_init = worker_init
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.sample_rate = sample_rate
+        self.max_backlog_seconds = float(max_backlog_seconds)
+        self.policy = policy
+        self.aging = max(0.0, float(aging))
+        self.sequence = itertools.count()
+
+        edges = [0] + sorted(float(b) for b in bucket_bounds) + [float("inf")]
+        self.buckets = [DurationBucket(low, high) for low, high in zip(edges, edges[1:])]
+
+        self.threads = []
+        # Per-worker (function, job) tasks from run_on_each_worker, ahead of the queue
+        self.worker_tasks = [collections.deque() for _ in range(self.workers)]
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.queued = 0
+        self.queued_seconds = 0.0
+        self.running_seconds = 0.0
+        # Worker index -> (audio seconds, start time) of the batch it is running
+        self.running = {}
+        # Compute seconds per audio second, smoothed; pessimistic until measured
+        self.real_time_factor = 1.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = {"deadline": 0, "disconnect": 0}
+        self.batch_histogram = {}
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(i,),
+                name=f"inference-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        print(
+            f"🧵 Inference pool started | workers={self.workers} | queue={self.max_queue}"
+            f" | max_batch={self.max_batch_size} | max_wait={self.max_wait * 1000:.0f}ms"
+            f" | buckets={', '.join(bucket.name for bucket in self.buckets)}"
+            f" | policy={self.policy}"
+        )
+        return self
+
+    def bucket_for(self, duration):
+        for bucket in self.buckets:
+            if duration < bucket.high:
+                return bucket
+        return self.buckets[-1]
+
+    def priority(self, job):
+        """Static sort key; lower runs first.
+
+        The aged SJF cost ``duration - aging * (now - submitted)`` shifts by the
+        same amount for every job as time passes, so ordering on
+        ``duration + aging * submitted`` is equivalent and never needs re-sorting.
+        """
+        if self.policy == "fifo":
+            return job.submitted
+        return job.duration + self.aging * job.submitted
+
+    def _remaining_running(self):
+        """Estimated compute seconds left on the batches the workers are running"""
+        now = time.monotonic()
+        return sum(
+            max(0.0, seconds * self.real_time_factor - (now - started))
+            for seconds, started in self.running.values()
+        )
+
+    def _estimated_wait(self):
+        work = self.queued_seconds * self.real_time_factor + self._remaining_running()
+        return work / self.workers
+
+    def _admit(self, duration):
+        """Raise PoolFullError if ``duration`` more seconds of audio would overflow the queue"""
+        if len(self.running) + self.queued < self.workers:
+            # A worker is free to start on it right away
+            return
+        if self.queued >= self.max_queue or (
+            self.queued_seconds > 0 and self.queued_seconds + duration > self.max_backlog_seconds
+        ):
+            self.rejected += 1
+            retry_after = max(1, math.ceil(self._estimated_wait()))
+            raise PoolFullError(
+                f"Server busy: {self.queued_seconds:.1f}s of audio queued", retry_after=retry_after
+            )
+
+    def check_admission(self, duration=0.0):
+        """Cheap pre-check so overloaded requests are refused before decoding"""
+        with self.lock:
+            self._admit(duration)
+
+    def record_cancel(self, reason):
+        """Count a cancellation that happened outside the queue (e.g. while decoding)"""
+        with self.lock:
+            self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+
+    def submit(self, audio, deadline=None, is_disconnected=None, admit=True):
+        """Queue audio for inference; raises PoolFullError if the backlog is full.
+
+        ``admit=False`` skips the backlog check, for follow-up segments of an
+        upload that was already admitted and bounds its own jobs in flight.
+        """
+        job = InferenceJob(audio, len(audio) / self.sample_rate, deadline, is_disconnected)
+        job.check()
+        with self.ready:
+            if admit:
+                self._admit(job.duration)
+            heapq.heappush(
+                self.bucket_for(job.duration).jobs,
+                (self.priority(job), next(self.sequence), job)
+            )
+            self.queued += 1
+            self.queued_seconds += job.duration
+            self.ready.notify_all()
+        return job
+
+    def cancel(self, job, reason):
+        """Drop a job that has not started yet; returns False if a worker already has it"""
+        with self.lock:
+            if job.state != "queued":
+                return False
+            job.state = "cancelled"
+            self.queued -= 1
+            self.queued_seconds -= job.duration
+            self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+        job.finish(error=JobCancelled(reason))
+        return True
+
+    def transcribe(self, audio, deadline=None, is_disconnected=None, poll_interval=0.1):
+        """Submit audio and block until a worker has produced the result.
+
+        While waiting, the job's deadline and client are polled so abandoned
+        requests leave the queue instead of occupying a model worker.
+        """
+        return self.wait(self.submit(audio, deadline, is_disconnected), poll_interval)
+
+    def wait(self, job, poll_interval=0.1):
+        """Block until a submitted job finishes, cancelling it if it is abandoned"""
+        while not job.done.wait(poll_interval):
+            reason = job.cancel_reason()
+            if reason is not None and self.cancel(job, reason):
+                break
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def run_on_each_worker(self, function):
+        """Call ``function()`` once on every worker thread and return the results.
+
+        The calls bypass the queue, admission and stats. Used for warm-up:
+        each worker builds its own OpenMP team and applies its thread plan
+        on its first forward pass, so warming another thread leaves it cold.
+        """
+        if not self.threads:
+            raise RuntimeError("Inference pool is not started")
+
+        jobs = []
+        with self.ready:
+            for tasks in self.worker_tasks:
+                job = InferenceJob(None, 0.0)
+                tasks.append((function, job))
+                jobs.append(job)
+            self.ready.notify_all()
+
+        for job in jobs:
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+        return [job.result for job in jobs]
+
+    def running_jobs(self):
+        """Jobs of the batch the calling worker thread is running, in ``run_batch`` order"""
+        return getattr(self.local, "batch", [])
+
+    def load(self):
+        """Current backlog for health checks and retry hints"""
+        with self.lock:
+            return {
+                "depth": self.queued,
+                "queued_audio_seconds": round(self.queued_seconds, 2),
+                "running_audio_seconds": round(self.running_seconds, 2),
+                "busy_workers": len(self.running),
+                "max_backlog_seconds": self.max_backlog_seconds,
+                "real_time_factor": round(self.real_time_factor, 3),
+                "estimated_wait_seconds": round(self._estimated_wait(), 2)
+            }
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.max_queue,
+                "queued": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "cancelled": dict(self.cancelled),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batch_histogram": {
+                    str(size): count for size, count in sorted(self.batch_histogram.items())
+                },
+                "policy": self.policy,
+                "aging": self.aging,
+                "buckets": [bucket.stats() for bucket in self.buckets]
+            }
+
+    def _purge(self):
+        """Pop cancelled jobs off the heads of the bucket heaps, expiring overdue ones on the way"""
+        for bucket in self.buckets:
+            while bucket.jobs:
+                job = bucket.jobs[0][2]
+                if job.state == "queued":
+                    reason = job.cancel_reason()
+                    if reason is None:
+                        break
+                    job.state = "cancelled"
+                    self.queued -= 1
+                    self.queued_seconds -= job.duration
+                    self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+                    job.finish(error=JobCancelled(reason))
+                heapq.heappop(bucket.jobs)
+
+    def _take(self, bucket):
+        _, _, job = heapq.heappop(bucket.jobs)
+        job.state = "running"
+        self.queued -= 1
+        self.queued_seconds -= job.duration
+        self.running_seconds += job.duration
+        return job
+
+    def _next_batch(self, index=0):
+        """Block for one job, then keep collecting from its bucket until full or the wait expires.
+
+        A task for this worker from ``run_on_each_worker`` comes first and is
+        returned as ``(None, (function, job))``.
+        """
+        with self.ready:
+            while True:
+                if self.worker_tasks[index]:
+                    return None, self.worker_tasks[index].popleft()
+                self._purge()
+                if self.queued > 0:
+                    break
+                self.ready.wait()
+
+            # Serve the bucket holding the highest-priority job
+            bucket = min(
+                (b for b in self.buckets if b.jobs),
+                key=lambda b: b.jobs[0][:2]
+            )
+            batch = [self._take(bucket)]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                self._purge()
+                if bucket.jobs:
+                    batch.append(self._take(bucket))
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.ready.wait(remaining)
+
+            bucket.record_batch(batch)
+            self.batch_histogram[len(batch)] = self.batch_histogram.get(len(batch), 0) + 1
+            self.running[index] = (sum(job.duration for job in batch), time.monotonic())
+
+        return bucket, batch
+
+    def _worker_loop(self, index=0):
+        if self.worker_init is not None:
+            try:
+                self.worker_init(index)
+            except Exception:
+                traceback.print_exc()
+
+        while True:
+            bucket, batch = self._next_batch(index)
+            if bucket is None:
+                function, job = batch
+                try:
+                    job.finish(result=function())
+                except Exception as e:
+                    traceback.print_exc()
+                    job.finish(error=e)
+                continue
+
+            batch_seconds = sum(job.duration for job in batch)
+            started = time.monotonic()
+
+            self.local.batch = batch
+            try:
+                results = self.run_batch([job.audio for job in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} jobs")
+            except Exception as e:
+                self.local.batch = []
+                traceback.print_exc()
+                with self.lock:
+                    self.failed += len(batch)
+                    self.running_seconds -= batch_seconds
+                    self.running.pop(index, None)
+                for job in batch:
+                    job.finish(error=e)
+            else:
+                self.local.batch = []
+                finished = time.monotonic()
+                errors = [result for result in results if isinstance(result, Exception)]
+                with self.lock:
+                    self.completed += len(batch) - len(errors)
+                    for error in errors:
+                        if isinstance(error, JobCancelled):
+                            self.cancelled[error.reason] = self.cancelled.get(error.reason, 0) + 1
+                        else:
+                            self.failed += 1
+                    self.running_seconds -= batch_seconds
+                    self.running.pop(index, None)
+                    if batch_seconds > 0:
+                        measured = (finished - started) / batch_seconds
+                        self.real_time_factor = 0.8 * self.real_time_factor + 0.2 * measured
+                    bucket.completed += len(batch)
+                    bucket.latencies.extend(finished - job.submitted for job in batch)
+                for job, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        job.finish(error=result)
+                    else:
+                        job.finish(result=result)
@@ -0,0 +1,121 @@
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import torch
+import transformers
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2Processor
+
+WEIGHTS_FILE = "weights.pt"
+META_FILE = "cache_meta.json"
+
+# Local memory-mapped weight cache shared by the servers and tools
+DEFAULT_CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+
+
+def resolve_cache_root(setting=None):
+    """Cache root for a GREENVOICE_MODEL_CACHE / --cache value: unset is the default, "off" is None"""
+    if setting == "off":
+        return None
+    return setting or DEFAULT_CACHE_ROOT
+
+
+def cache_path(cache_root, model_name):
+    return os.path.join(cache_root, model_name.replace("/", "__"))
+
+
+def cache_meta(model_name):
+    """Versions the cached state dict depends on; a mismatch forces a rebuild"""
+    return {
+        "model": model_name,
+        "torch": torch.__version__,
+        "transformers": transformers.__version__
+    }
+
+
+def is_cache_valid(path, model_name):
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f) == cache_meta(model_name) and os.path.isfile(
+                os.path.join(path, WEIGHTS_FILE)
+            )
+    except (OSError, ValueError):
+        return False
+
+
+def write_cache(path, model_name, processor, model):
+    """Save config, processor and a flat state dict that torch.load can memory-map"""
+    os.makedirs(path, exist_ok=True)
+    processor.save_pretrained(path)
+    model.config.save_pretrained(path)
+
+    # Write then rename so a concurrent reader never maps a half-written file
+    fd, temp_path = tempfile.mkstemp(dir=path, suffix=".tmp")
+    os.close(fd)
+    torch.save(model.state_dict(), temp_path)
+    os.replace(temp_path, os.path.join(path, WEIGHTS_FILE))
+
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(cache_meta(model_name), f)
+
+
+def load_from_cache(path):
+    """Build the model on the meta device and point its tensors at mmapped file pages.
+
+    Nothing is deserialised or copied: parameters are views of the weight
+    file in the page cache, so pages load lazily on first use and every
+    process on the host that maps the same file shares them.
+    """
+    processor = Wav2Vec2Processor.from_pretrained(path)
+    config = Wav2Vec2Config.from_pretrained(path)
+
+    state_dict = torch.load(
+        os.path.join(path, WEIGHTS_FILE),
+        map_location="cpu",
+        mmap=True,
+        weights_only=True
+    )
+
+    with torch.device("meta"):
+        model = Wav2Vec2ForCTC(config)
+    model.load_state_dict(state_dict, assign=True)
+
+    if any(t.is_meta for t in itertools.chain(model.parameters(), model.buffers())):
+        raise RuntimeError("Cached weights do not cover every model tensor")
+
+    model.eval()
+    return processor, model
+
+
+def load_cached_model(model_name, cache_root):
+    """Load ``model_name`` from the local mmap cache, filling the cache on a miss.
+
+    Returns ``(processor, model, source)`` where source is ``"mmap_cache"`` or
+    ``"hub"``. Any problem with the cache falls back to ``from_pretrained``;
+    ``cache_root=None`` always loads from the hub and caches nothing.
+    """
+    path = cache_path(cache_root, model_name) if cache_root is not None else None
+
+    if path is not None and is_cache_valid(path, model_name):
+        try:
+            started = time.monotonic()
+            processor, model = load_from_cache(path)
+            print(f"📦 Model mapped from cache {path} in {time.monotonic() - started:.2f}s")
+            return processor, model, "mmap_cache"
+        except Exception as e:
+            print(f"⚠️ Model cache unusable, reloading from hub: {e}")
+
+    processor = Wav2Vec2Processor.from_pretrained(model_name)
+    model = Wav2Vec2ForCTC.from_pretrained(model_name)
+    model.eval()
+
+    if path is not None:
+        try:
+            write_cache(path, model_name, processor, model)
+            print(f"📦 Model cached at {path}")
+        except Exception as e:
+            print(f"⚠️ Could not write model cache: {e}")
+
+    return processor, model, "hub"
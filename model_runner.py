@@ -0,0 +1,219 @@
+import math
+
+import torch
+
+
+class TorchBackend:
+    """Eager PyTorch forward pass over a Wav2Vec2ForCTC model.
+
+    Backends expose ``forward_logits(input_values, attention_mask)`` and
+    ``output_lengths(sample_lengths)``; transcribe_batch only talks to that
+    interface so other runtimes (ONNX Runtime, traced graphs) can stand in.
+    """
+
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+
+    def forward_logits(self, input_values, attention_mask=None):
+        with torch.no_grad():
+            if attention_mask is None:
+                return self.model(input_values).logits
+            return self.model(input_values, attention_mask=attention_mask).logits
+
+    def output_lengths(self, lengths):
+        return self.model._get_feat_extract_output_lengths(lengths)
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+def as_backend(model):
+    """Accept either a backend or a bare model (wrapped in TorchBackend)"""
+    return model if hasattr(model, "forward_logits") else TorchBackend(model)
+
+
+def frame_hop(backend):
+    """Input samples per logit frame: the product of the conv feature encoder strides"""
+    config = backend.config if hasattr(backend, "config") else backend.model.config
+    return math.prod(config.conv_stride)
+
+
+def batch_logits(processor, backend, speeches, sampling_rate=16000):
+    """Logits of a batch of clips (frames past a clip's end are padding) and each clip's own frame count"""
+    input_values = [
+        processor(speech, sampling_rate=sampling_rate, return_tensors="pt").input_values[0]
+        for speech in speeches
+    ]
+    lengths = torch.tensor([len(values) for values in input_values])
+    frame_counts = backend.output_lengths(lengths)
+
+    batch = torch.zeros(len(input_values), int(lengths.max()))
+    attention_mask = torch.zeros(batch.shape, dtype=torch.long)
+    for i, values in enumerate(input_values):
+        batch[i, :len(values)] = values
+        attention_mask[i, :len(values)] = 1
+
+    print(f"🧠 Running Wav2Vec2 model | backend={backend.name} | batch={len(speeches)} | padded_samples={batch.shape[1]}")
+
+    if processor.feature_extractor.return_attention_mask:
+        return backend.forward_logits(batch, attention_mask), frame_counts
+
+    # Without an attention mask (e.g. base-960h) zero padding would shift the
+    # GroupNorm statistics and the attention, so each length runs unpadded
+    logits = None
+    for length in sorted(set(lengths.tolist())):
+        rows = torch.nonzero(lengths == length)[:, 0]
+        part = backend.forward_logits(batch[rows, :length])
+        if logits is None:
+            logits = part.new_zeros(len(input_values), int(frame_counts.max()), part.shape[-1])
+        logits[rows, :part.shape[1]] = part
+
+    return logits, frame_counts
+
+
+def ctc_confidence(predicted_ids, best_probs, blank_id):
+    """Mean top-token probability over non-blank frames (all frames if every frame is blank)"""
+    speech_frames = predicted_ids != blank_id
+    if speech_frames.any():
+        best_probs = best_probs[speech_frames]
+    return float(best_probs.mean()) if len(best_probs) else 0.0
+
+
+def transcribe_batch(processor, model, speeches, sampling_rate=16000, with_confidence=False):
+    """Run Wav2Vec2 on a list of 16kHz clips in as few forward passes as possible.
+
+    Each clip is feature-normalized on its own. Checkpoints that take an
+    attention mask get one batch zero-padded to the longest clip, with the
+    mask hiding the padding. Checkpoints without one (base-960h) cannot
+    ignore padding, so only clips of equal length share a forward pass.
+    Either way a clip transcribes as it would alone, and its logits are cut
+    back to its own frame count before decoding. ``model`` may be a
+    Wav2Vec2ForCTC or any inference backend.
+
+    With ``with_confidence`` each result is a ``(text, confidence)`` pair,
+    where confidence is the mean top-token probability over the clip's
+    non-blank CTC frames (all frames if every frame is blank).
+    """
+    backend = as_backend(model)
+    logits, frame_counts = batch_logits(processor, backend, speeches, sampling_rate)
+    predicted_ids = torch.argmax(logits, dim=-1)
+
+    texts = [
+        processor.decode(predicted_ids[i, :int(frame_counts[i])])
+        for i in range(len(speeches))
+    ]
+    if not with_confidence:
+        return texts
+
+    best_probs = torch.softmax(logits.float(), dim=-1).max(dim=-1).values
+    blank_id = processor.tokenizer.pad_token_id
+
+    return [
+        (text, ctc_confidence(
+            predicted_ids[i, :int(frame_counts[i])],
+            best_probs[i, :int(frame_counts[i])],
+            blank_id
+        ))
+        for i, text in enumerate(texts)
+    ]
+
+
+def transcribe_long(processor, model, speech, sampling_rate=16000, window_seconds=30,
+                    stride_seconds=5, batch_size=4, check=None, with_confidence=False):
+    """Transcribe a clip of any length through fixed, overlapping windows.
+
+    Windows of ``window_seconds`` advance by the window minus both strides
+    and run ``batch_size`` at a time (a shorter last window alone), so
+    attention cost and memory depend on the window, not the clip. Each window's logits lose the ``stride_seconds``
+    at either edge, where the model saw too little context, except at the
+    clip's own start and end. Windows start on logit frame boundaries, so the
+    kept frames tile the clip's frame grid exactly; the stitched frame ids
+    are then CTC-decoded in one go, merging tokens that straddle a cut.
+    Clips no longer than one window take the single-pass path unchanged.
+
+    ``check`` is called between batches (``InferenceJob.check`` raises to
+    abandon the clip). Returns the text, or ``(text, confidence)``.
+    """
+    backend = as_backend(model)
+    hop = frame_hop(backend)
+    window = int(window_seconds * sampling_rate) // hop * hop
+    stride = round(stride_seconds * sampling_rate / hop) * hop
+    if stride < hop or window - 2 * stride <= 0:
+        raise ValueError("stride_seconds must be above zero and under half of window_seconds")
+
+    if len(speech) <= window:
+        return transcribe_batch(processor, backend, [speech], sampling_rate, with_confidence)[0]
+
+    # (start sample, first kept frame, kept frames up to; None = to the end)
+    windows = []
+    start = 0
+    while True:
+        last = start + window >= len(speech)
+        windows.append((
+            start,
+            0 if start == 0 else stride // hop,
+            None if last else (window - stride) // hop
+        ))
+        if last:
+            break
+        start += window - 2 * stride
+
+    blank_id = processor.tokenizer.pad_token_id
+    kept_ids = []
+    kept_probs = []
+
+    # Full windows share batches; a shorter last window runs on its own so
+    # it is never zero-padded to the others' length
+    full = windows if len(speech) - windows[-1][0] >= window else windows[:-1]
+    groups = [full[i:i + batch_size] for i in range(0, len(full), batch_size)]
+    if len(full) < len(windows):
+        groups.append(windows[-1:])
+
+    for group in groups:
+        if check is not None:
+            check()
+
+        logits, frame_counts = batch_logits(
+            processor, backend,
+            [speech[start:start + window] for start, _, _ in group],
+            sampling_rate
+        )
+        predicted_ids = torch.argmax(logits, dim=-1)
+        if with_confidence:
+            best_probs = torch.softmax(logits.float(), dim=-1).max(dim=-1).values
+
+        for i, (_, keep_from, keep_to) in enumerate(group):
+            frames = int(frame_counts[i])
+            keep_to = frames if keep_to is None else min(keep_to, frames)
+            kept_ids.append(predicted_ids[i, keep_from:keep_to])
+            if with_confidence:
+                kept_probs.append(best_probs[i, keep_from:keep_to])
+
+    predicted_ids = torch.cat(kept_ids)
+    text = processor.decode(predicted_ids)
+    if not with_confidence:
+        return text
+    return text, ctc_confidence(predicted_ids, torch.cat(kept_probs), blank_id)
+
+
+def quantize_model(model):
+    """Dynamically quantize every nn.Linear to int8 for CPU inference.
+
+    Weights are stored as int8 and activations are quantized on the fly per
+    batch; the convolutional feature encoder stays in fp32.
+    """
+    engines = torch.backends.quantized.supported_engines
+    if "fbgemm" in engines:
+        torch.backends.quantized.engine = "fbgemm"
+    elif "qnnpack" in engines:
+        torch.backends.quantized.engine = "qnnpack"
+
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model,
+        {torch.nn.Linear},
+        dtype=torch.qint8
+    )
+    quantized.eval()
+    return quantized
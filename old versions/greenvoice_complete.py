@@ -90,8 +90,11 @@ class GreenVoiceTranscriber:
                         import soundfile as sf
                         audio_data, sr = sf.read(audio_file_path)
                         if sr != self.sample_rate:
+                            import math
                             import scipy.signal as signal
-                            audio_data = signal.resample(audio_data, int(len(audio_data) * self.sample_rate / sr))
+                            # Polyphase FIR instead of an FFT over the whole clip
+                            divisor = math.gcd(int(sr), self.sample_rate)
+                            audio_data = signal.resample_poly(audio_data, self.sample_rate // divisor, int(sr) // divisor)
                         print(f"✅ Audio loaded with soundfile: shape={audio_data.shape}")
                     except Exception as e3:
                         print(f"❌ Failed to load with soundfile: {e3}")
@@ -0,0 +1,148 @@
+import os
+import threading
+
+import torch
+
+from model_cache import cache_path
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+def default_onnx_path(cache_root, model_name):
+    return os.path.join(cache_path(cache_root, model_name), "model.onnx")
+
+
+def feature_output_lengths(config, lengths):
+    """Logit frame count per clip, from the conv feature encoder's kernels and strides"""
+    for kernel, stride in zip(config.conv_kernel, config.conv_stride):
+        lengths = torch.div(lengths - kernel, stride, rounding_mode="floor") + 1
+    return lengths
+
+
+class OnnxBackend:
+    """Wav2Vec2 logits from an exported ONNX graph run by ONNX Runtime on CPU.
+
+    The session is created lazily per process, so the backend can be built
+    before a pre-fork and each worker still gets its own ORT thread pools.
+    """
+
+    name = "onnx"
+
+    def __init__(self, onnx_path, config, providers=("CPUExecutionProvider",)):
+        if ort is None:
+            raise RuntimeError("onnxruntime is not installed")
+        if not os.path.isfile(onnx_path):
+            raise FileNotFoundError(f"{onnx_path} not found; run export_onnx.py first")
+
+        self.onnx_path = onnx_path
+        self.config = config
+        self.providers = list(providers)
+        self.session = None
+        self.session_pid = None
+        self.input_names = set()
+        self.lock = threading.Lock()
+
+    def _session(self):
+        with self.lock:
+            if self.session is None or self.session_pid != os.getpid():
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                self.session = ort.InferenceSession(
+                    self.onnx_path, options, providers=self.providers
+                )
+                self.input_names = {i.name for i in self.session.get_inputs()}
+                self.session_pid = os.getpid()
+            return self.session
+
+    def forward_logits(self, input_values, attention_mask=None):
+        session = self._session()
+        feeds = {"input_values": input_values.numpy()}
+        if "attention_mask" in self.input_names:
+            if attention_mask is None:
+                attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+            feeds["attention_mask"] = attention_mask.numpy()
+
+        (logits,) = session.run(["logits"], feeds)
+        return torch.from_numpy(logits)
+
+    def output_lengths(self, lengths):
+        return feature_output_lengths(self.config, lengths)
+
+    def stats(self):
+        return {"backend": self.name, "onnx_path": self.onnx_path}
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Export wrapper: plain tensor in, plain logits tensor out"""
+
+    def __init__(self, model, with_attention_mask):
+        super().__init__()
+        self.model = model
+        self.with_attention_mask = with_attention_mask
+
+    def forward(self, input_values, attention_mask=None):
+        if self.with_attention_mask:
+            return self.model(input_values, attention_mask=attention_mask).logits
+        return self.model(input_values).logits
+
+
+def export_onnx(model, onnx_path, with_attention_mask=False, opset=17):
+    """Export Wav2Vec2ForCTC with dynamic batch and sequence-length axes"""
+    os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+    wrapper = _LogitsOnly(model, with_attention_mask).eval()
+
+    sample = torch.zeros(1, 16000)
+    args = (sample,)
+    input_names = ["input_values"]
+    dynamic_axes = {
+        "input_values": {0: "batch", 1: "samples"},
+        "logits": {0: "batch", 1: "frames"}
+    }
+    if with_attention_mask:
+        args = (sample, torch.ones(1, 16000, dtype=torch.long))
+        input_names.append("attention_mask")
+        dynamic_axes["attention_mask"] = {0: "batch", 1: "samples"}
+
+    temp_path = onnx_path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            args,
+            temp_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    os.replace(temp_path, onnx_path)
+
+
+def validate_onnx(model, backend, shapes=((1, 16000), (2, 48000), (3, 117000)), seed=0):
+    """Compare ONNX Runtime logits to PyTorch on random batches of several shapes.
+
+    Returns one dict per shape with the max absolute logit difference and the
+    fraction of frames whose argmax token agrees.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    results = []
+
+    for batch_size, samples in shapes:
+        input_values = torch.randn(batch_size, samples, generator=generator)
+
+        with torch.no_grad():
+            expected = model(input_values).logits
+        actual = backend.forward_logits(input_values)
+
+        results.append({
+            "shape": [batch_size, samples],
+            "max_abs_diff": float((expected - actual).abs().max()),
+            "argmax_agreement": float(
+                (expected.argmax(dim=-1) == actual.argmax(dim=-1)).float().mean()
+            )
+        })
+
+    return results
@@ -0,0 +1,109 @@
+import gc
+import os
+import signal
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, and no fork either
+    resource = None
+
+
+def share_model_memory(model, move_weights=True):
+    """Move the weights into shared memory and freeze the heap before forking.
+
+    Workers forked afterwards map the same weight pages instead of each
+    holding a private copy, and freezing the GC keeps collections in the
+    children from dirtying (and so copying) pages of long-lived objects.
+    Weights that are already file-mapped are shared through the page cache;
+    pass ``move_weights=False`` so they are not copied into shared memory.
+    """
+    if move_weights:
+        model.share_memory()
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage():
+    """Return this process' RSS / PSS / shared memory in MB"""
+    usage = {"pid": os.getpid()}
+
+    try:
+        # smaps_rollup splits resident memory into private and shared pages
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+        usage["rss_mb"] = round(fields.get("Rss", 0) / 1024, 1)
+        usage["pss_mb"] = round(fields.get("Pss", 0) / 1024, 1)
+        usage["shared_mb"] = round(
+            (fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1
+        )
+    except OSError:
+        if resource is None:
+            return usage
+        # ru_maxrss is KB on Linux and bytes on macOS; good enough as a fallback
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["max_rss_mb"] = round(max_rss / 1024, 1)
+
+    return usage
+
+
+def serve_prefork(httpd, processes, on_worker_start=None):
+    """Fork ``processes`` workers that all accept on the already-bound server socket.
+
+    The parent only supervises: it restarts workers that exit unexpectedly and
+    stops them all on Ctrl+C. Threads do not survive fork, so anything that
+    runs threads (the inference pool) must be started in ``on_worker_start``.
+    """
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                if on_worker_start is not None:
+                    on_worker_start(index)
+                print(f"👷 Worker {index} serving | pid={os.getpid()}")
+                httpd.serve_forever()
+            except Exception as e:
+                print(f"❌ Worker {index} crashed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = index
+
+    for index in range(processes):
+        spawn(index)
+
+    print(f"✅ Pre-fork mode | {processes} workers | parent pid={os.getpid()}")
+
+    try:
+        while children:
+            pid, status = os.wait()
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            print(f"⚠️ Worker {index} (pid={pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            spawn(index)
+
+    except KeyboardInterrupt:
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        raise
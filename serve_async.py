@@ -0,0 +1,451 @@
+import asyncio
+import concurrent.futures
+import http
+import json
+import mimetypes
+import os
+import time
+import traceback
+import urllib.parse
+import webbrowser
+
+import serve_final
+from inference_pool import JobCancelled, PoolFullError
+from serve_final import (
+    PORT,
+    AudioRejected,
+    ModelNotReady,
+    check_cancelled,
+    decode_audio,
+    finish_transcription,
+    health_status,
+    liveness_status,
+    not_ready_response,
+    pcm_decoder,
+    readiness_status,
+    request_deadline,
+    require_model,
+    transcript,
+    transcription_response,
+)
+from uploads import UploadRejected, parse_upload
+
+# Threads for CPU work (upload parsing, audio decoding, file reads)
+DECODE_THREADS = int(os.environ.get("GREENVOICE_DECODE_THREADS", os.cpu_count() or 4))
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = float(os.environ.get("GREENVOICE_KEEPALIVE_TIMEOUT", 15))
+
+# Request line plus headers may not exceed this
+MAX_HEADER_BYTES = 64 * 1024
+
+STATIC_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+COMMON_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Request-Timeout',
+}
+
+cpu_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=DECODE_THREADS,
+    thread_name_prefix="decode"
+)
+
+
+# ==============================
+# HTTP PLUMBING
+# ==============================
+
+class Request:
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        url = urllib.parse.urlsplit(target)
+        self.path = url.path
+        self.query = dict(urllib.parse.parse_qsl(url.query))
+        self.version = version
+        self.headers = headers
+        self.body = b''
+
+    @property
+    def chunked(self):
+        return 'chunked' in self.headers.get('transfer-encoding', '').lower()
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+
+class Response:
+    def __init__(self, status, body=b'', content_type='application/json', headers=None, close=False):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.close = close
+
+
+def json_response(status, payload, headers=None, close=False):
+    return Response(status, json.dumps(payload).encode(), headers=headers, close=close)
+
+
+class DisconnectWatcher:
+    """Reads ahead one byte while a request is processed; EOF means the client left.
+
+    Browsers never half-close an HTTP connection, so EOF here is a real
+    disconnect. If a byte of a pipelined request is read instead, the
+    connection is closed after the response since that byte is gone.
+    """
+
+    def __init__(self, reader):
+        self.task = asyncio.ensure_future(reader.read(1))
+
+    def is_disconnected(self):
+        # Also polled from inference worker threads; only reads task state
+        if not self.task.done() or self.task.cancelled():
+            return False
+        return self.task.exception() is not None or self.task.result() == b''
+
+    @property
+    def consumed_data(self):
+        return self.task.done() and not self.is_disconnected() and not self.task.cancelled()
+
+    def stop(self):
+        if not self.task.done():
+            self.task.cancel()
+
+
+async def read_request(reader):
+    """Parse one request; returns None when the client closed an idle connection"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, version = lines[0].split(' ', 2)
+
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    request = Request(method.upper(), target, version.strip(), headers)
+
+    # Chunked bodies are not read here; route() refuses them and closes the
+    # connection so the chunk data is never parsed as a request
+    if request.chunked:
+        return request
+
+    content_length = int(headers.get('content-length', 0) or 0)
+    if content_length:
+        request.body = await asyncio.wait_for(
+            reader.readexactly(content_length),
+            serve_final.REQUEST_TIMEOUT
+        )
+
+    return request
+
+
+async def write_response(writer, response, keep_alive):
+    reason = http.HTTPStatus(response.status).phrase
+    headers = {
+        'Content-Type': response.content_type,
+        'Content-Length': str(len(response.body)),
+        'Connection': 'keep-alive' if keep_alive else 'close',
+        **COMMON_HEADERS,
+        **response.headers,
+    }
+    head = f"HTTP/1.1 {response.status} {reason}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode('latin-1') + b'\r\n')
+    if response.body:
+        writer.write(response.body)
+    await writer.drain()
+
+
+# ==============================
+# ROUTES
+# ==============================
+
+def read_static_file(path):
+    """Resolve a URL path inside STATIC_ROOT and read it (runs on the executor)"""
+    relative = urllib.parse.unquote(path).lstrip('/')
+    full_path = os.path.realpath(os.path.join(STATIC_ROOT, relative))
+
+    if os.path.commonpath([full_path, STATIC_ROOT]) != STATIC_ROOT or not os.path.isfile(full_path):
+        return None
+
+    with open(full_path, 'rb') as f:
+        return f.read(), mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+
+async def serve_static(path):
+    if path == '/':
+        path = '/greenvoice_working.html'
+
+    loop = asyncio.get_running_loop()
+    found = await loop.run_in_executor(cpu_executor, read_static_file, path)
+    if found is None:
+        return Response(404, b'File not found', content_type='text/plain')
+
+    body, content_type = found
+    return Response(200, body, content_type=content_type)
+
+
+async def wait_for_job(job, deadline, watcher):
+    """Await an inference job without holding a thread, cancelling it if abandoned"""
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def resolve():
+        if not finished.done():
+            finished.set_result(None)
+
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(resolve))
+
+    while not finished.done():
+        waiters = {finished}
+        if not watcher.task.done():
+            waiters.add(watcher.task)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+        if finished.done():
+            break
+        if watcher.is_disconnected():
+            reason = "disconnect"
+        elif deadline is not None and time.monotonic() >= deadline:
+            reason = "deadline"
+        else:
+            continue
+
+        if serve_final.inference_pool.cancel(job, reason):
+            raise JobCancelled(reason)
+        # Already running on a worker; the result is simply discarded by the caller
+        await finished
+
+    if job.error is not None:
+        raise job.error
+    return job.result
+
+
+async def transcribe(audio_bytes, deadline, watcher, decode=decode_audio):
+    """Async twin of serve_final.transcribe_bytes with CPU work on executors"""
+    require_model()
+
+    loop = asyncio.get_running_loop()
+
+    try:
+        print("\n🎵 Starting transcription process...")
+
+        speech = await loop.run_in_executor(cpu_executor, decode, audio_bytes)
+
+        # Decoding can take a while; skip inference nobody will read
+        check_cancelled(deadline, watcher.is_disconnected)
+
+        job = serve_final.inference_pool.submit(
+            speech,
+            deadline=deadline,
+            is_disconnected=watcher.is_disconnected
+        )
+        return finish_transcription(await wait_for_job(job, deadline, watcher))
+
+    except AudioRejected as e:
+        return transcript(str(e))
+
+    except (PoolFullError, JobCancelled, ModelNotReady, UploadRejected):
+        raise
+
+    except Exception as e:
+        print("❌ Transcription error:", e)
+        traceback.print_exc()
+        return transcript(f"Error: {str(e)}")
+
+
+async def handle_transcribe(request, reader):
+    deadline = request_deadline(request.headers.get('x-request-timeout'))
+    watcher = DisconnectWatcher(reader)
+    loop = asyncio.get_running_loop()
+
+    try:
+        require_model()
+
+        # Refuse before decoding if the backlog is already full
+        serve_final.inference_pool.check_admission()
+
+        if request.path == '/api/transcribe/pcm':
+            # Already-captured 16kHz PCM skips decoding (and resampling)
+            decode = pcm_decoder(request.query)
+            audio_data = request.body
+        else:
+            decode = decode_audio
+            audio_data = await loop.run_in_executor(
+                cpu_executor, parse_upload, request.body, request.headers.get('content-type')
+            )
+
+        print(f"\n🎵 Audio received: {len(audio_data)} bytes")
+
+        check_cancelled(deadline, watcher.is_disconnected)
+        transcription = await transcribe(audio_data, deadline, watcher, decode)
+
+        response = json_response(200, transcription_response(transcription))
+
+    except ModelNotReady as e:
+        print(f"⏳ {e}, rejecting request")
+        response = json_response(*not_ready_response(e))
+
+    except UploadRejected as e:
+        print(f"❌ {e}")
+        response = json_response(e.status, {
+            "error": str(e),
+            "status": "rejected"
+        })
+
+    except PoolFullError as e:
+        print(f"⏳ {e}, rejecting request (retry after {e.retry_after}s)")
+        response = json_response(429, {
+            "error": str(e),
+            "status": "busy",
+            "retry_after": e.retry_after
+        }, {'Retry-After': str(e.retry_after)})
+
+    except JobCancelled as e:
+        print(f"🚫 {e}")
+        if e.reason == "disconnect":
+            return None
+        response = json_response(504, {
+            "error": str(e),
+            "status": "cancelled"
+        })
+
+    except Exception as e:
+        print("❌ POST error:", e)
+        response = json_response(500, {
+            "error": str(e)
+        })
+
+    finally:
+        watcher.stop()
+
+    response.close = watcher.consumed_data
+    return response
+
+
+async def route(request, reader):
+    if request.chunked:
+        # The body was left unread, so the connection cannot be reused
+        return json_response(501, {
+            "error": "Chunked uploads are not supported by the asyncio server; "
+                     "send Content-Length or use serve_final.py",
+            "status": "rejected"
+        }, close=True)
+
+    if request.method == 'OPTIONS':
+        return Response(200)
+
+    if request.method == 'GET':
+        if request.path == '/api/health':
+            return json_response(200, health_status())
+        if request.path == '/api/live':
+            return json_response(*liveness_status())
+        if request.path == '/api/ready':
+            return json_response(*readiness_status())
+        return await serve_static(request.path)
+
+    if request.method == 'POST':
+        if request.path in ('/api/transcribe/stream', '/api/transcribe/file'):
+            return json_response(501, {
+                "error": f"{request.path} is only served by serve_final.py",
+                "status": "rejected"
+            })
+        if request.path in ('/api/transcribe', '/api/transcribe/pcm'):
+            return await handle_transcribe(request, reader)
+        return Response(404)
+
+    return Response(501)
+
+
+async def handle_connection(reader, writer):
+    peer = writer.get_extra_info('peername')
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except asyncio.LimitOverrunError:
+                await write_response(writer, Response(431), keep_alive=False)
+                break
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                break
+
+            if request is None:
+                break
+
+            response = await route(request, reader)
+            if response is None:
+                # Client disconnected mid-request
+                break
+
+            keep_alive = request.keep_alive and not response.close
+            await write_response(writer, response, keep_alive)
+            print(f"{peer[0] if peer else '-'} - {request.method} {request.path} {response.status}")
+
+            if not keep_alive:
+                break
+
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+
+    finally:
+        writer.close()
+
+
+# ==============================
+# START SERVER
+# ==============================
+
+async def main():
+    server = await asyncio.start_server(
+        handle_connection,
+        host="",
+        port=PORT,
+        limit=MAX_HEADER_BYTES,
+        reuse_address=True
+    )
+    serve_final.start_worker()
+    serve_final.start_model_loading()
+
+    print(f"✅ Async server running at http://localhost:{PORT}")
+    webbrowser.open(f"http://localhost:{PORT}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def run_server():
+    print("\n🌿 Starting GreenVoice (asyncio)...")
+    print(f"📱 Open: http://localhost:{PORT}")
+    print(f"🧵 Decode threads: {DECODE_THREADS}")
+    print("⏹️ Press Ctrl+C to stop\n")
+
+    try:
+        asyncio.run(main())
+
+    except KeyboardInterrupt:
+        print("\n⏹️ GreenVoice stopped by user")
+
+    except Exception as e:
+        print("❌ Server failed:", e)
+
+
+if __name__ == "__main__":
+    run_server()
@@ -3,13 +3,112 @@ import socketserver
 import webbrowser
 import os
 import json
-import base64
 import datetime
+import select
+import socket
 import tempfile
+import threading
+import time
 import traceback
+import urllib.parse
+
+from inference_pool import InferencePool, JobCancelled, PoolFullError
+from prefork import memory_usage, serve_prefork, share_model_memory
+from uploads import (
+    UploadRejected,
+    is_raw_audio,
+    iter_chunked_body,
+    iter_sized_body,
+    parse_upload,
+)
 
 PORT = 5555
 
+MODEL_NAME = os.environ.get("GREENVOICE_MODEL", "facebook/wav2vec2-base-960h")
+
+# Long-form mode: clips longer than one window are run as overlapping
+# windows (batched) whose logits are stitched after dropping the strides
+LONG_FORM_WINDOW_SECONDS = float(os.environ.get("GREENVOICE_LONG_FORM_WINDOW", 30))
+LONG_FORM_STRIDE_SECONDS = float(os.environ.get("GREENVOICE_LONG_FORM_STRIDE", 5))
+LONG_FORM_BATCH_SIZE = int(os.environ.get("GREENVOICE_LONG_FORM_BATCH", 4))
+
+# Inference precision: "fp32", or "int8" to dynamically quantize the linear layers at load time
+PRECISION = os.environ.get("GREENVOICE_PRECISION", "fp32")
+
+# Local memory-mapped weight cache, model_cache.DEFAULT_CACHE_ROOT when unset
+# ("off" loads straight from the hub every time)
+MODEL_CACHE = os.environ.get("GREENVOICE_MODEL_CACHE")
+
+# Cascade: run every clip on MODEL_NAME first and re-run clips whose CTC
+# confidence is below the threshold on this larger model ("" = off)
+CASCADE_MODEL = os.environ.get("GREENVOICE_CASCADE_MODEL", "")
+CASCADE_THRESHOLD = float(os.environ.get("GREENVOICE_CASCADE_THRESHOLD", 0.9))
+
+# Inference backend: "torch" (eager PyTorch), "onnx" (ONNX Runtime, see export_onnx.py)
+# or "compiled" (torch.compile for short-clip shapes, eager for the rest)
+BACKEND = os.environ.get("GREENVOICE_BACKEND", "torch")
+ONNX_PATH = os.environ.get("GREENVOICE_ONNX_PATH")
+
+# Compiled backend: clips up to this many seconds run through one graph per
+# batch size (dynamic length, unpadded); longer clips run eager
+COMPILE_MAX_SECONDS = float(os.environ.get("GREENVOICE_COMPILE_MAX_SECONDS", 3))
+COMPILE_BATCH_SIZES = os.environ.get("GREENVOICE_COMPILE_BATCH_SIZES", "1")
+
+# Model worker threads and a hard cap on how many decoded clips may wait
+INFERENCE_WORKERS = int(os.environ.get("GREENVOICE_WORKERS", 2))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("GREENVOICE_QUEUE_SIZE", 64))
+# Admission control: refuse with 429 once this much audio is waiting for a worker
+# Admission control: refuse with 429 once this much audio is queued or running
+MAX_BACKLOG_SECONDS = float(os.environ.get("GREENVOICE_MAX_BACKLOG_SECONDS", 120))
+
+# Micro-batching: clips arriving within MAX_WAIT_MS are run as one batch
+# (grouped by length on checkpoints without an attention mask)
+MAX_BATCH_SIZE = int(os.environ.get("GREENVOICE_MAX_BATCH", 8))
+MAX_BATCH_WAIT_MS = float(os.environ.get("GREENVOICE_MAX_WAIT_MS", 10))
+
+# Default per-request deadline in seconds; clients may lower or raise it with X-Request-Timeout
+REQUEST_TIMEOUT = float(os.environ.get("GREENVOICE_REQUEST_TIMEOUT", 60))
+
+# Pre-fork worker processes sharing one copy of the model weights (1 = off)
+PREFORK_PROCESSES = int(os.environ.get("GREENVOICE_PROCESSES", 1))
+
+# Thread plan: PyTorch threads per inference worker (0 = split the CPUs evenly
+# over processes x workers), inter-op threads, and per-worker CPU pinning
+INTRA_OP_THREADS = int(os.environ.get("GREENVOICE_INTRA_OP_THREADS", 0))
+INTER_OP_THREADS = int(os.environ.get("GREENVOICE_INTER_OP_THREADS", 1))
+PIN_CPUS = os.environ.get("GREENVOICE_PIN_CPUS", "0") == "1"
+
+# Scheduling: "sjf" serves the shortest clip first, aged by time waited; "fifo" is arrival order
+SCHEDULER_POLICY = os.environ.get("GREENVOICE_SCHEDULER", "sjf")
+SJF_AGING = float(os.environ.get("GREENVOICE_SJF_AGING", 1.0))
+
+# Duration bucket upper bounds in seconds; clips only batch within a bucket
+DURATION_BUCKETS = [
+    float(b) for b in os.environ.get("GREENVOICE_BUCKETS", "3,10,30").split(",") if b.strip()
+]
+
+# Streaming uploads are cut into segments of about this many seconds, each
+# transcribed as soon as it has been received and decoded
+STREAM_SEGMENT_SECONDS = float(os.environ.get("GREENVOICE_STREAM_SEGMENT_SECONDS", 10))
+
+# Streamed and file uploads: segments in flight at once; the reader waits
+# for the oldest before reading on, which bounds memory, and only the first
+# segment goes through admission control
+FILE_MAX_PENDING = int(os.environ.get("GREENVOICE_FILE_MAX_PENDING", 4))
+
+# Pre-started ffmpeg processes kept ready for decoding (0 = spawn per request)
+FFMPEG_POOL_SIZE = int(os.environ.get("GREENVOICE_FFMPEG_POOL", 2))
+FFMPEG_TIMEOUT = float(os.environ.get("GREENVOICE_FFMPEG_TIMEOUT", 30))
+
+# Resampler tier for audio decoded in process (WAV/FLAC, raw PCM):
+# "fast", "medium" or "high"
+RESAMPLE_QUALITY = os.environ.get("GREENVOICE_RESAMPLE_QUALITY", "medium")
+
+# Warm-up clip lengths, run on every inference worker before readiness:
+# "buckets" (one per duration bucket), "off" (just one 1s clip), or explicit
+# seconds such as "1,5,20"
+WARMUP = os.environ.get("GREENVOICE_WARMUP", "buckets")
+
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # ==============================
@@ -18,21 +117,767 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 try:
     import numpy as np
-    import librosa
-    import torch
-    from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+    from model_cache import DEFAULT_CACHE_ROOT, cache_path, load_cached_model, resolve_cache_root
+    from model_runner import TorchBackend, quantize_model, transcribe_batch, transcribe_long
+    from onnx_backend import OnnxBackend, default_onnx_path
+    from compiled_backend import CompiledBackend
+    from thread_plan import ThreadPlan
+    from audio_decode import FFMPEG, PCM_FORMATS, PCM_RATE_RANGE, AudioDecoder, DecodeError, pcm_samples
+    from decoder_pool import DecoderPool
+    from block_reader import iter_audio_blocks
+    from streaming import BufferedDecoder, StreamingDecoder, StreamingTranscription
 
-    print("🌿 Loading Wav2Vec2 model...")
-    processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-    model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
-    model.eval()   # IMPORTANT
-    print("✅ Model loaded successfully")
-
-    MODEL_LOADED = True
+    ML_AVAILABLE = True
 
 except Exception as e:
-    print(f"⚠️ Model loading failed: {e}")
-    MODEL_LOADED = False
+    print(f"⚠️ ML libraries unavailable: {e}")
+    ML_AVAILABLE = False
+
+
+# ==============================
+# MODEL LOADING
+# ==============================
+
+# Filled in by load_model() on a background thread once the port is bound
+processor = None
+model = None
+inference_backend = None
+
+# Escalation model of the cascade, when CASCADE_MODEL is set (always eager torch)
+cascade_processor = None
+cascade_model = None
+cascade_backend = None
+
+# True only once the model is loaded and a warm-up inference has succeeded
+MODEL_LOADED = False
+
+model_status = {
+    "state": "loading",
+    "model": MODEL_NAME,
+    "error": None,
+    "source": None,
+    "backend": BACKEND,
+    "precision": PRECISION,
+    "cascade_model": CASCADE_MODEL or None,
+    "cascade_source": None,
+    "load_seconds": None,
+    "rss_before_load_mb": None,
+    "rss_after_load_mb": None,
+    "warmup_seconds": None,
+    "warmup": []
+}
+
+
+class ModelNotReady(Exception):
+    """Raised for transcription requests that arrive before the model is ready"""
+
+
+def warmup_lengths():
+    """Clip lengths (seconds) to warm up on, per the WARMUP setting.
+
+    Readiness means at least one inference succeeded, so "off" (or an empty
+    list) still runs a single short clip.
+    """
+    if WARMUP == "off":
+        return [1.0]
+    if WARMUP == "buckets":
+        # Longest clip of each bounded bucket; the open-ended one at its lower edge
+        return sorted({
+            bucket.high if bucket.high != float("inf") else bucket.low
+            for bucket in inference_pool.buckets
+        })
+    return [float(seconds) for seconds in WARMUP.split(",") if seconds.strip()] or [1.0]
+
+
+def warm_up_model():
+    """Run processor + model on synthetic audio of each serving length, on every pool worker.
+
+    The first real request otherwise pays for allocator growth, kernel
+    selection and processor initialisation, and each worker thread for its
+    own OpenMP team, thread count and CPU pinning; each length is timed and
+    logged.
+    """
+    started = time.monotonic()
+    rng = np.random.default_rng(0)
+    timings = []
+
+    # Compiled backends build their graphs here, before readiness is reported
+    if hasattr(inference_backend, "precompile"):
+        print("⚙️ Compiling model graphs...")
+        inference_backend.precompile(
+            with_attention_mask=bool(processor.feature_extractor.return_attention_mask)
+        )
+
+    for seconds in warmup_lengths():
+        print(f"🔥 Warming up Wav2Vec2 on {seconds:g}s of audio | workers={inference_pool.workers}...")
+        clip_started = time.monotonic()
+
+        noise = rng.standard_normal(int(seconds * 16000)).astype(np.float32) * 0.1
+
+        def warm_up_worker():
+            run_inference_batch([noise])
+            if cascade_backend is not None:
+                transcribe_batch(cascade_processor, cascade_backend, [noise])
+
+        inference_pool.run_on_each_worker(warm_up_worker)
+
+        elapsed = time.monotonic() - clip_started
+        timings.append({"audio_seconds": seconds, "seconds": round(elapsed, 3)})
+        print(f"✅ Warm-up {seconds:g}s took {elapsed:.3f}s")
+
+    reset_cascade_stats()
+    model_status["warmup"] = timings
+    model_status["warmup_seconds"] = round(time.monotonic() - started, 3)
+    print(f"✅ Warm-up finished in {model_status['warmup_seconds']}s")
+
+
+def finish_loading():
+    """Warm up the loaded model and only then report ready"""
+    global MODEL_LOADED
+
+    model_status["state"] = "warming_up"
+    try:
+        warm_up_model()
+
+        MODEL_LOADED = True
+        model_status["state"] = "ready"
+
+    except Exception as e:
+        print(f"⚠️ Model warm-up failed: {e}")
+        traceback.print_exc()
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+
+
+def load_wav2vec2(model_name):
+    """Processor and eval-mode model, from the local mmap cache unless it is off"""
+    loaded_processor, loaded_model, source = load_cached_model(model_name, resolve_cache_root(MODEL_CACHE))
+    loaded_model.eval()   # IMPORTANT
+
+    if PRECISION == "int8":
+        print(f"🗜️ Quantizing {model_name} linear layers to int8...")
+        loaded_model = quantize_model(loaded_model)
+    elif PRECISION != "fp32":
+        raise ValueError(f"Unknown precision: {PRECISION}")
+
+    return loaded_processor, loaded_model, source
+
+
+def load_model(warm_up=True):
+    """Load Wav2Vec2, then (by default) warm it up; readiness flips only after the warm-up"""
+    global processor, model, inference_backend
+    global cascade_processor, cascade_model, cascade_backend
+
+    try:
+        if not ML_AVAILABLE:
+            raise RuntimeError("ML libraries are not installed")
+
+        started = time.monotonic()
+        model_status["rss_before_load_mb"] = memory_usage().get("rss_mb")
+        print("🌿 Loading Wav2Vec2 model...")
+
+        processor, model, model_status["source"] = load_wav2vec2(MODEL_NAME)
+
+        if PRECISION != "fp32" and BACKEND != "torch":
+            raise ValueError("int8 precision applies to the torch backend only")
+
+        # Derived artifacts (Inductor cache, ONNX graph) need a directory even with the cache off
+        cache_root = resolve_cache_root(MODEL_CACHE) or DEFAULT_CACHE_ROOT
+
+        if BACKEND == "torch":
+            inference_backend = TorchBackend(model)
+        elif BACKEND == "compiled":
+            inference_backend = CompiledBackend(
+                model,
+                cache_dir=os.path.join(cache_path(cache_root, MODEL_NAME), "inductor"),
+                max_seconds=COMPILE_MAX_SECONDS,
+                batch_sizes=[int(x) for x in COMPILE_BATCH_SIZES.split(",") if x.strip()]
+            )
+        elif BACKEND == "onnx":
+            # The mmapped torch weights stay untouched; only the config is used
+            inference_backend = OnnxBackend(
+                ONNX_PATH or default_onnx_path(cache_root, MODEL_NAME),
+                model.config
+            )
+        else:
+            raise ValueError(f"Unknown backend: {BACKEND}")
+
+        if CASCADE_MODEL:
+            print(f"🌿 Loading cascade model {CASCADE_MODEL}...")
+            cascade_processor, cascade_model, model_status["cascade_source"] = load_wav2vec2(CASCADE_MODEL)
+            cascade_backend = TorchBackend(cascade_model)
+
+        model_status["load_seconds"] = round(time.monotonic() - started, 3)
+        model_status["rss_after_load_mb"] = memory_usage().get("rss_mb")
+        model_status["state"] = "loaded"
+        print(
+            f"✅ Model loaded successfully in {model_status['load_seconds']}s"
+            f" | source={model_status['source']} | backend={BACKEND} | precision={PRECISION}"
+            f" | RSS {model_status['rss_before_load_mb']} -> {model_status['rss_after_load_mb']} MB"
+        )
+
+    except Exception as e:
+        print(f"⚠️ Model loading failed: {e}")
+        traceback.print_exc()
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+        return
+
+    if warm_up:
+        finish_loading()
+
+
+def start_model_loading():
+    thread = threading.Thread(target=load_model, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def require_model():
+    if MODEL_LOADED:
+        return
+    if model_status["state"] == "failed":
+        raise ModelNotReady(f"Model failed to load: {model_status['error']}")
+    raise ModelNotReady(f"Model is not ready yet ({model_status['state']})")
+
+
+# ==============================
+# INFERENCE
+# ==============================
+
+def transcript(text, model_name=None, confidence=None):
+    """Pipeline result: the text plus which model produced it and how sure it was"""
+    return {"text": text, "model": model_name, "confidence": confidence}
+
+
+cascade_lock = threading.Lock()
+cascade_stats = {}
+
+
+def reset_cascade_stats():
+    with cascade_lock:
+        cascade_stats.update({
+            "clips": 0,
+            "escalated": 0,
+            "base_compute_seconds": 0.0,
+            "cascade_compute_seconds": 0.0
+        })
+
+
+reset_cascade_stats()
+
+
+def cascade_status():
+    if not CASCADE_MODEL:
+        return None
+    with cascade_lock:
+        stats = dict(cascade_stats)
+    stats["escalation_rate"] = round(stats["escalated"] / stats["clips"], 4) if stats["clips"] else 0.0
+    stats["base_compute_seconds"] = round(stats["base_compute_seconds"], 3)
+    stats["cascade_compute_seconds"] = round(stats["cascade_compute_seconds"], 3)
+    stats["model"] = CASCADE_MODEL
+    stats["threshold"] = CASCADE_THRESHOLD
+    return stats
+
+
+def run_model(model_processor, backend, speeches, checks):
+    """(text, confidence) per clip; clips longer than one long-form window go window by window.
+
+    A long clip whose job is cancelled between windows gets the JobCancelled
+    as its result, which fails only that job in the pool.
+    """
+    window = int(LONG_FORM_WINDOW_SECONDS * 16000)
+    results = [None] * len(speeches)
+
+    short = [i for i, speech in enumerate(speeches) if len(speech) <= window]
+    if short:
+        batch = transcribe_batch(
+            model_processor, backend, [speeches[i] for i in short], with_confidence=True
+        )
+        for i, result in zip(short, batch):
+            results[i] = result
+
+    for i, speech in enumerate(speeches):
+        if results[i] is not None:
+            continue
+        print(f"📜 Long-form transcription of {len(speech) / 16000:.1f}s of audio")
+        try:
+            results[i] = transcribe_long(
+                model_processor, backend, speech,
+                window_seconds=LONG_FORM_WINDOW_SECONDS,
+                stride_seconds=LONG_FORM_STRIDE_SECONDS,
+                batch_size=LONG_FORM_BATCH_SIZE,
+                check=checks[i],
+                with_confidence=True
+            )
+        except JobCancelled as e:
+            results[i] = e
+    return results
+
+
+def run_inference_batch(speeches):
+    """Run Wav2Vec2 on a list of normalized 16kHz clips (called on pool workers).
+
+    With a cascade configured, clips the base model is unsure about are
+    re-run as one batch on the cascade model, whose text replaces the base
+    output for those clips.
+    """
+    jobs = inference_pool.running_jobs()
+    checks = [job.check for job in jobs] if len(jobs) == len(speeches) else [None] * len(speeches)
+
+    started = time.monotonic()
+    results = [
+        result if isinstance(result, JobCancelled) else transcript(result[0], MODEL_NAME, result[1])
+        for result in run_model(processor, inference_backend, speeches, checks)
+    ]
+    if cascade_backend is None:
+        return results
+
+    base_finished = time.monotonic()
+    uncertain = [
+        i for i, result in enumerate(results)
+        if isinstance(result, dict) and result["confidence"] < CASCADE_THRESHOLD
+    ]
+    if uncertain:
+        print(f"🔁 Escalating {len(uncertain)}/{len(speeches)} clips to {CASCADE_MODEL}")
+        rerun = run_model(
+            cascade_processor, cascade_backend,
+            [speeches[i] for i in uncertain],
+            [checks[i] for i in uncertain]
+        )
+        for i, result in zip(uncertain, rerun):
+            if isinstance(result, JobCancelled):
+                results[i] = result
+            else:
+                results[i] = transcript(result[0], CASCADE_MODEL, result[1])
+
+    with cascade_lock:
+        cascade_stats["clips"] += len(speeches)
+        cascade_stats["escalated"] += len(uncertain)
+        cascade_stats["base_compute_seconds"] += base_finished - started
+        cascade_stats["cascade_compute_seconds"] += time.monotonic() - base_finished
+
+    return results
+
+
+thread_plan = ThreadPlan(
+    INFERENCE_WORKERS,
+    intra_op_threads=INTRA_OP_THREADS,
+    inter_op_threads=INTER_OP_THREADS,
+    pin=PIN_CPUS,
+    processes=PREFORK_PROCESSES
+) if ML_AVAILABLE else None
+
+# Index of this pre-fork worker process, so pinned CPU slices stay disjoint
+process_index = 0
+
+
+def init_inference_worker(index):
+    if thread_plan is not None:
+        cpus = thread_plan.apply_worker(index, process_index)
+        if cpus:
+            print(f"📌 Worker {process_index}.{index} pinned to CPUs {cpus}")
+
+
+inference_pool = InferencePool(
+    run_inference_batch,
+    workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_QUEUE_SIZE,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=MAX_BATCH_WAIT_MS,
+    bucket_bounds=DURATION_BUCKETS,
+    max_backlog_seconds=MAX_BACKLOG_SECONDS,
+    policy=SCHEDULER_POLICY,
+    aging=SJF_AGING,
+    worker_init=init_inference_worker
+)
+
+
+# ==============================
+# TRANSCRIPTION PIPELINE
+# ==============================
+
+class AudioRejected(Exception):
+    """Upload decoded fine but holds nothing worth transcribing; message goes back to the user"""
+
+
+def request_deadline(timeout_header=None):
+    """Monotonic deadline from an X-Request-Timeout value (seconds) or the server default"""
+    try:
+        timeout = float(timeout_header if timeout_header is not None else REQUEST_TIMEOUT)
+    except ValueError:
+        timeout = REQUEST_TIMEOUT
+    if timeout <= 0:
+        return None
+    return time.monotonic() + timeout
+
+
+def check_cancelled(deadline, is_disconnected=None):
+    """Stop between pipeline stages if the deadline passed or the client left"""
+    reason = None
+    if deadline is not None and time.monotonic() >= deadline:
+        reason = "deadline"
+    elif is_disconnected is not None and is_disconnected():
+        reason = "disconnect"
+    if reason is not None:
+        inference_pool.record_cancel(reason)
+        raise JobCancelled(reason)
+
+
+decoder_pool = None
+if ML_AVAILABLE and FFMPEG is not None and FFMPEG_POOL_SIZE > 0:
+    decoder_pool = DecoderPool(size=FFMPEG_POOL_SIZE, timeout=FFMPEG_TIMEOUT)
+
+audio_decoder = AudioDecoder(ffmpeg_pool=decoder_pool, resample_quality=RESAMPLE_QUALITY) if ML_AVAILABLE else None
+
+
+def decode_audio(audio_bytes):
+    """Decode an upload to a normalized 16kHz mono array, or raise AudioRejected"""
+
+    # Decode from memory to 16kHz mono; a temp file is only the last resort
+    speech, path = audio_decoder.decode(audio_bytes)
+    print(f"✅ Audio loaded | Shape: {speech.shape} | Sample Rate: 16000 | path={path}")
+
+    return prepare_speech(speech)
+
+
+def pcm_decoder(params):
+    """decode(body) for raw PCM uploads described by format, rate and channels.
+
+    ``params`` holds the query parameters: ``format`` is s16le (default) or
+    f32le, ``rate`` defaults to 16000 (PCM_RATE_RANGE bounds it) and
+    ``channels`` to 1.
+    """
+    sample_format = params.get("format", "s16le")
+    if sample_format not in PCM_FORMATS:
+        raise UploadRejected(f"Unknown PCM format {sample_format!r}; use one of {', '.join(PCM_FORMATS)}")
+    try:
+        rate = int(params.get("rate", 16000))
+        channels = int(params.get("channels", 1))
+    except ValueError:
+        raise UploadRejected("PCM rate and channels must be integers")
+    if channels <= 0:
+        raise UploadRejected("PCM channels must be positive")
+    if not PCM_RATE_RANGE[0] <= rate <= PCM_RATE_RANGE[1]:
+        raise UploadRejected(f"PCM rate must be between {PCM_RATE_RANGE[0]} and {PCM_RATE_RANGE[1]} Hz")
+
+    def decode(body):
+        started = time.perf_counter()
+        try:
+            speech = pcm_samples(body, sample_format, rate, channels, quality=RESAMPLE_QUALITY)
+        except DecodeError as e:
+            audio_decoder.record("pcm", False, time.perf_counter() - started)
+            audio_decoder.record_format("pcm", None, time.perf_counter() - started)
+            raise UploadRejected(str(e))
+        audio_decoder.record("pcm", True, time.perf_counter() - started)
+        audio_decoder.record_format("pcm", "pcm", time.perf_counter() - started)
+
+        print(f"✅ PCM received | {sample_format} | {rate}Hz x{channels} | Shape: {speech.shape}")
+        return prepare_speech(speech)
+
+    return decode
+
+
+def prepare_speech(speech):
+    """Reject empty or near-silent audio and peak-normalize the rest"""
+
+    if len(speech) == 0:
+        raise AudioRejected("No audio detected.")
+
+    # Check amplitude
+    max_amp = np.max(np.abs(speech))
+    print(f"🔊 Max amplitude: {max_amp}")
+
+    if max_amp < 0.01:
+        raise AudioRejected("Audio too quiet. Please speak louder.")
+
+    # Normalize audio
+    speech = speech / max_amp
+    print("✅ Audio normalized")
+
+    return speech
+
+
+def finish_transcription(result):
+    print(f"🎉 Raw transcription: '{result['text']}' | model={result['model']}")
+
+    if result["text"].strip() == "":
+        return transcript("No speech detected.", result["model"], result["confidence"])
+
+    return transcript(result["text"].strip(), result["model"], result["confidence"])
+
+
+def transcribe_bytes(audio_bytes, deadline=None, is_disconnected=None, decode=None):
+    """Full blocking pipeline: decode, queue for the model, tidy the text"""
+
+    require_model()
+
+    try:
+        print("\n🎵 Starting transcription process...")
+
+        speech = (decode or decode_audio)(audio_bytes)
+
+        # Decoding can take a while; skip inference nobody will read
+        check_cancelled(deadline, is_disconnected)
+
+        # Hand the model call to the inference pool
+        result = inference_pool.transcribe(
+            speech,
+            deadline=deadline,
+            is_disconnected=is_disconnected
+        )
+
+        return finish_transcription(result)
+
+    except AudioRejected as e:
+        return transcript(str(e))
+
+    except (PoolFullError, JobCancelled, ModelNotReady, UploadRejected):
+        raise
+
+    except Exception as e:
+        print("❌ Transcription error:", e)
+        traceback.print_exc()
+        return transcript(f"Error: {str(e)}")
+
+
+streaming_lock = threading.Lock()
+streaming_stats = {
+    "uploads": 0,
+    "segments": 0,
+    "segments_before_upload_end": 0,
+    "silent_segments": 0,
+    "files": 0,
+    "file_seconds": 0.0
+}
+
+
+def merge_transcripts(parts):
+    """Join per-segment results; confidence is weighted by segment duration"""
+    texts = [result["text"].strip() for result, _ in parts if result["text"].strip()]
+    models = sorted({result["model"] for result, _ in parts if result["model"]})
+    scored = [(result["confidence"], duration) for result, duration in parts if result["confidence"] is not None]
+    total = sum(duration for _, duration in scored)
+    confidence = sum(c * duration for c, duration in scored) / total if total else None
+    return transcript(" ".join(texts), ",".join(models) or None, confidence)
+
+
+def transcribe_stream(chunks, deadline=None, is_disconnected=None):
+    """Streaming pipeline: decode the body as it arrives and queue segments early"""
+
+    require_model()
+
+    try:
+        decoder = StreamingDecoder(timeout=FFMPEG_TIMEOUT, pool=decoder_pool)
+    except DecodeError as e:
+        print(f"⚠️ Streaming decode unavailable ({e}), buffering the upload")
+        decoder = BufferedDecoder(audio_decoder)
+
+    stream = StreamingTranscription(
+        inference_pool,
+        segment_seconds=STREAM_SEGMENT_SECONDS,
+        deadline=deadline,
+        is_disconnected=is_disconnected,
+        max_pending=FILE_MAX_PENDING
+    )
+
+    try:
+        print("\n🎵 Receiving streamed audio...")
+
+        try:
+            for chunk in chunks:
+                decoder.feed(chunk)
+                stream.add(decoder.read())
+                check_cancelled(deadline, is_disconnected)
+
+            early = len(stream.jobs) + len(stream.results)
+            stream.add(decoder.close())
+            if stream.decoded_samples == 0:
+                raise AudioRejected("No audio detected.")
+
+            parts = stream.finish()
+
+        except BaseException as e:
+            decoder.abort()
+            stream.cancel(e.reason if isinstance(e, JobCancelled) else "aborted")
+            raise
+
+        if not parts:
+            raise AudioRejected("Audio too quiet. Please speak louder.")
+
+        with streaming_lock:
+            streaming_stats["uploads"] += 1
+            streaming_stats["segments"] += len(parts)
+            streaming_stats["segments_before_upload_end"] += early
+            streaming_stats["silent_segments"] += stream.skipped
+
+        print(
+            f"✅ Streamed {stream.decoded_samples / 16000:.1f}s of audio"
+            f" | segments={len(parts)} | started before upload end={early}"
+        )
+        return finish_transcription(merge_transcripts(parts))
+
+    except AudioRejected as e:
+        return transcript(str(e))
+
+    except (PoolFullError, JobCancelled, ModelNotReady, UploadRejected):
+        raise
+
+    except Exception as e:
+        print("❌ Transcription error:", e)
+        traceback.print_exc()
+        return transcript(f"Error: {str(e)}")
+
+
+def spool_upload(chunks):
+    """Write a request body to a temp file as it arrives; returns the path"""
+    with tempfile.NamedTemporaryFile(suffix=".audio", delete=False) as spool:
+        try:
+            for chunk in chunks:
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    return spool.name
+
+
+def transcribe_file(chunks, deadline=None, is_disconnected=None):
+    """Long recordings: spool to disk, then feed 16kHz blocks through the segment pipeline.
+
+    Neither the upload nor the decoded audio is ever held whole; memory
+    stays around FILE_MAX_PENDING segments however long the recording is.
+    """
+
+    require_model()
+
+    path = spool_upload(chunks)
+    stream = StreamingTranscription(
+        inference_pool,
+        segment_seconds=STREAM_SEGMENT_SECONDS,
+        deadline=deadline,
+        is_disconnected=is_disconnected,
+        max_pending=FILE_MAX_PENDING
+    )
+
+    try:
+        print(f"\n🎵 File received: {os.path.getsize(path)} bytes")
+
+        blocks = iter_audio_blocks(path, STREAM_SEGMENT_SECONDS, quality=RESAMPLE_QUALITY)
+
+        try:
+            for block in blocks:
+                stream.add([block])
+                check_cancelled(deadline, is_disconnected)
+
+            if stream.decoded_samples == 0:
+                raise AudioRejected("No audio detected.")
+
+            parts = stream.finish()
+
+        except BaseException as e:
+            blocks.close()
+            stream.cancel(e.reason if isinstance(e, JobCancelled) else "aborted")
+            raise
+
+        if not parts:
+            raise AudioRejected("Audio too quiet. Please speak louder.")
+
+        seconds = stream.decoded_samples / 16000
+        with streaming_lock:
+            streaming_stats["files"] += 1
+            streaming_stats["file_seconds"] += seconds
+            streaming_stats["segments"] += len(parts)
+            streaming_stats["silent_segments"] += stream.skipped
+
+        print(f"✅ Read {seconds:.1f}s of audio from file | segments={len(parts)}")
+        return finish_transcription(merge_transcripts(parts))
+
+    except AudioRejected as e:
+        return transcript(str(e))
+
+    except DecodeError as e:
+        # Unreadable format, found up front or only once reading got there
+        raise UploadRejected(str(e), status=415)
+
+    except (PoolFullError, JobCancelled, ModelNotReady, UploadRejected):
+        raise
+
+    except Exception as e:
+        print("❌ Transcription error:", e)
+        traceback.print_exc()
+        return transcript(f"Error: {str(e)}")
+
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def health_status():
+    return {
+        "status": "healthy",
+        "model_loaded": MODEL_LOADED,
+        "model": dict(model_status),
+        "backend": inference_backend.stats() if inference_backend is not None else None,
+        "queue": inference_pool.load(),
+        "inference": inference_pool.stats(),
+        "cascade": cascade_status(),
+        "decode": audio_decoder.stats() if audio_decoder is not None else None,
+        "streaming": dict(streaming_stats),
+        "ffmpeg_pool": decoder_pool.stats() if decoder_pool is not None else None,
+        "threads": thread_plan.stats() if thread_plan is not None else None,
+        "process": memory_usage()
+    }
+
+
+def liveness_status():
+    """Process is up; fails only if model loading failed so an orchestrator restarts it"""
+    alive = model_status["state"] != "failed"
+    return (200 if alive else 503), {
+        "status": "alive" if alive else "dead",
+        "model_state": model_status["state"],
+        "error": model_status["error"]
+    }
+
+
+def readiness_status():
+    """Ready only once the model is loaded and warmed up"""
+    return (200 if MODEL_LOADED else 503), {
+        "status": "ready" if MODEL_LOADED else model_status["state"],
+        "model": dict(model_status)
+    }
+
+
+def not_ready_response(e):
+    """Status, payload and headers for a transcription refused with ModelNotReady"""
+    return 503, {
+        "error": str(e),
+        "status": model_status["state"]
+    }, {'Retry-After': '5'}
+
+
+def transcription_response(result):
+    confidence = result["confidence"]
+    return {
+        "transcription": result["text"],
+        "model": result["model"],
+        "confidence": round(confidence, 4) if confidence is not None else None,
+        "status": "success",
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
+
+# ==============================
+# SERVER
+# ==============================
+
+class GreenVoiceServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """One thread per connection so static files never queue behind inference"""
+
+    daemon_threads = True
+    allow_reuse_address = True
 
 
 # ==============================
@@ -47,82 +892,92 @@ class GreenVoiceHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Expires', '0')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Request-Timeout')
         super().end_headers()
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
 
+    def client_disconnected(self):
+        """True once the client has closed its end of the connection"""
+        try:
+            if hasattr(select, "poll"):
+                # poll() has no FD_SETSIZE limit, unlike select() on POSIX
+                poller = select.poll()
+                poller.register(self.connection, select.POLLIN)
+                readable = poller.poll(0)
+            else:
+                # Windows select() takes any socket handle
+                readable, _, _ = select.select([self.connection], [], [], 0)
+            if not readable:
+                return False
+            # Readable with no data means the peer sent FIN
+            return self.connection.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            # Connection reset by the peer
+            return True
+
+    def send_json(self, status, payload, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+
     # ==============================
     # TRANSCRIPTION FUNCTION
     # ==============================
 
-    def transcribe_audio(self, audio_bytes):
-
-        if not MODEL_LOADED:
-            return "Model not loaded."
-
-        try:
-            print("\n🎵 Starting transcription process...")
-
-            # Save temporary WebM file
-            with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                temp_path = temp_file.name
+    def transcribe_audio(self, audio_bytes, deadline=None, decode=None):
+        return transcribe_bytes(audio_bytes, deadline, self.client_disconnected, decode)
 
-            try:
-                # Load audio and resample to 16kHz
-                speech, sr = librosa.load(temp_path, sr=16000, mono=True)
-                print(f"✅ Audio loaded | Shape: {speech.shape} | Sample Rate: {sr}")
+    def transcribe_upload(self, deadline):
+        content_length = int(self.headers.get('Content-Length', 0))
+        post_data = self.rfile.read(content_length)
 
-                if len(speech) == 0:
-                    return "No audio detected."
+        # Raw audio, multipart or legacy base64 JSON, per Content-Type
+        audio_data = parse_upload(post_data, self.headers.get('Content-Type'))
 
-                # Check amplitude
-                max_amp = np.max(np.abs(speech))
-                print(f"🔊 Max amplitude: {max_amp}")
+        print(f"\n🎵 Audio received: {len(audio_data)} bytes")
 
-                if max_amp < 0.01:
-                    return "Audio too quiet. Please speak louder."
+        check_cancelled(deadline, self.client_disconnected)
+        return self.transcribe_audio(audio_data, deadline)
 
-                # Normalize audio
-                speech = speech / max_amp
-                print("✅ Audio normalized")
+    def transcribe_pcm_upload(self, deadline):
+        content_length = int(self.headers.get('Content-Length', 0))
+        post_data = self.rfile.read(content_length)
 
-                # Convert to model input
-                inputs = processor(
-                    speech,
-                    sampling_rate=16000,
-                    return_tensors="pt"
-                )
+        query = urllib.parse.urlsplit(self.path).query
+        decode = pcm_decoder(dict(urllib.parse.parse_qsl(query)))
 
-                print("🧠 Running Wav2Vec2 model...")
+        print(f"\n🎵 PCM received: {len(post_data)} bytes")
 
-                with torch.no_grad():
-                    logits = model(inputs.input_values).logits
+        check_cancelled(deadline, self.client_disconnected)
+        return self.transcribe_audio(post_data, deadline, decode)
 
-                predicted_ids = torch.argmax(logits, dim=-1)
-                transcription = processor.decode(predicted_ids[0])
+    def transcribe_streamed_upload(self, deadline):
+        if not is_raw_audio(self.headers.get('Content-Type')):
+            raise UploadRejected("Streaming uploads must be raw audio", status=415)
 
-                print(f"🎉 Raw transcription: '{transcription}'")
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            chunks = iter_chunked_body(self.rfile)
+        else:
+            chunks = iter_sized_body(self.rfile, int(self.headers.get('Content-Length', 0)))
 
-                if transcription.strip() == "":
-                    return "No speech detected."
+        return transcribe_stream(chunks, deadline, self.client_disconnected)
 
-                return transcription.strip()
+    def transcribe_file_upload(self, deadline):
+        if not is_raw_audio(self.headers.get('Content-Type')):
+            raise UploadRejected("File uploads must be raw audio", status=415)
 
-            finally:
-                try:
-                    os.unlink(temp_path)
-                    print("🗑️ Temporary file removed")
-                except:
-                    pass
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            chunks = iter_chunked_body(self.rfile)
+        else:
+            chunks = iter_sized_body(self.rfile, int(self.headers.get('Content-Length', 0)))
 
-        except Exception as e:
-            print("❌ Transcription error:", e)
-            traceback.print_exc()
-            return f"Error: {str(e)}"
+        return transcribe_file(chunks, deadline, self.client_disconnected)
 
     # ==============================
     # ROUTES
@@ -131,13 +986,15 @@ class GreenVoiceHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
 
         if self.path == '/api/health':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
-                "status": "healthy",
-                "model_loaded": MODEL_LOADED
-            }).encode())
+            self.send_json(200, health_status())
+            return
+
+        if self.path == '/api/live':
+            self.send_json(*liveness_status())
+            return
+
+        if self.path == '/api/ready':
+            self.send_json(*readiness_status())
             return
 
         if self.path == '/':
@@ -146,64 +1003,138 @@ class GreenVoiceHandler(http.server.SimpleHTTPRequestHandler):
         return super().do_GET()
 
     def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
 
-        if self.path == '/api/transcribe':
+        if path == '/api/transcribe/stream' or (
+            path == '/api/transcribe'
+            and 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+        ):
+            # The body is read while transcribing; after an early error part
+            # of it is still unread, so this connection cannot be reused
+            self.close_connection = True
+            self.handle_transcribe(self.transcribe_streamed_upload)
 
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
+        elif path == '/api/transcribe':
+            self.handle_transcribe(self.transcribe_upload)
 
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                audio_data = base64.b64decode(data['audio'])
+        elif path == '/api/transcribe/file':
+            # Long WAV/FLAC recordings, read back from disk in blocks
+            self.close_connection = True
+            self.handle_transcribe(self.transcribe_file_upload)
 
-                print(f"\n🎵 Audio received: {len(audio_data)} bytes")
+        elif path == '/api/transcribe/pcm':
+            # Already-captured 16kHz PCM skips decoding (and resampling)
+            self.handle_transcribe(self.transcribe_pcm_upload)
 
-                if MODEL_LOADED:
-                    transcription = self.transcribe_audio(audio_data)
-                else:
-                    transcription = "Model not loaded."
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def handle_transcribe(self, transcribe):
+        deadline = request_deadline(self.headers.get('X-Request-Timeout'))
 
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
+        try:
+            require_model()
 
-                self.wfile.write(json.dumps({
-                    "transcription": transcription,
-                    "status": "success",
-                    "timestamp": datetime.datetime.now().isoformat()
-                }).encode())
+            # Refuse before decoding if the backlog is already full
+            inference_pool.check_admission()
 
-            except Exception as e:
-                print("❌ POST error:", e)
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
-                    "error": str(e)
-                }).encode())
+            transcription = transcribe(deadline)
 
-        else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_json(200, transcription_response(transcription))
+
+        except ModelNotReady as e:
+            print(f"⏳ {e}, rejecting request")
+            self.send_json(*not_ready_response(e))
+
+        except UploadRejected as e:
+            print(f"❌ {e}")
+            self.send_json(e.status, {
+                "error": str(e),
+                "status": "rejected"
+            })
+
+        except PoolFullError as e:
+            print(f"⏳ {e}, rejecting request (retry after {e.retry_after}s)")
+            self.send_json(429, {
+                "error": str(e),
+                "status": "busy",
+                "retry_after": e.retry_after
+            }, {'Retry-After': str(e.retry_after)})
+
+        except JobCancelled as e:
+            print(f"🚫 {e}")
+            if e.reason == "disconnect":
+                # Nobody is listening; just drop the connection
+                self.close_connection = True
+                return
+            self.send_json(504, {
+                "error": str(e),
+                "status": "cancelled"
+            })
+
+        except Exception as e:
+            print("❌ POST error:", e)
+            self.send_json(500, {
+                "error": str(e)
+            })
 
 
 # ==============================
 # START SERVER
 # ==============================
 
-print("\n🌿 Starting GreenVoice...")
-print(f"📱 Open: http://localhost:{PORT}")
-print("🎤 Speak clearly into microphone")
-print("⏹️ Press Ctrl+C to stop\n")
+def start_worker(index=0):
+    global process_index
 
-try:
-    with socketserver.TCPServer(("", PORT), GreenVoiceHandler) as httpd:
-        print(f"✅ Server running at http://localhost:{PORT}")
-        webbrowser.open(f"http://localhost:{PORT}")
-        httpd.serve_forever()
+    process_index = index
+    if thread_plan is not None:
+        thread_plan.apply_process()
+        print(f"🧵 Thread plan {thread_plan.name} | inter-op={thread_plan.inter_op_threads}")
+    inference_pool.start()
+    if decoder_pool is not None:
+        decoder_pool.start()
 
-except KeyboardInterrupt:
-    print("\n⏹️ GreenVoice stopped by user")
+    # Pre-fork workers inherit a loaded but cold model; warm-up state
+    # (allocator, kernels) is per process, so each worker warms itself
+    if model_status["state"] == "loaded":
+        threading.Thread(target=finish_loading, name="model-warmup", daemon=True).start()
 
-except Exception as e:
-    print("❌ Server failed:", e)
+
+def run_server():
+    print("\n🌿 Starting GreenVoice...")
+    print(f"📱 Open: http://localhost:{PORT}")
+    print("🎤 Speak clearly into microphone")
+    print("⏹️ Press Ctrl+C to stop\n")
+
+    try:
+        with GreenVoiceServer(("", PORT), GreenVoiceHandler) as httpd:
+            print(f"✅ Server running at http://localhost:{PORT}")
+            webbrowser.open(f"http://localhost:{PORT}")
+
+            if PREFORK_PROCESSES > 1 and hasattr(os, "fork"):
+                # Workers must inherit the weights, so the parent loads them
+                # before forking; connections wait in the listen backlog
+                load_model(warm_up=False)
+                if model_status["state"] == "loaded":
+                    share_model_memory(model, move_weights=model_status["source"] != "mmap_cache")
+                    if cascade_model is not None:
+                        share_model_memory(
+                            cascade_model, move_weights=model_status["cascade_source"] != "mmap_cache"
+                        )
+                print(f"🧠 Model memory before fork: {memory_usage()}")
+                serve_prefork(httpd, PREFORK_PROCESSES, start_worker)
+            else:
+                start_worker()
+                start_model_loading()
+                httpd.serve_forever()
+
+    except KeyboardInterrupt:
+        print("\n⏹️ GreenVoice stopped by user")
+
+    except Exception as e:
+        print("❌ Server failed:", e)
+
+
+if __name__ == "__main__":
+    run_server()
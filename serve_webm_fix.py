@@ -5,7 +5,6 @@ import os
 import json
 import base64
 import datetime
-import tempfile
 import traceback
 
 # Set the port
@@ -17,16 +16,19 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 # Try to import the ML libraries
 try:
     import numpy as np
-    import librosa
     import torch
     import noisereduce as nr
-    from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+    from model_cache import load_cached_model, resolve_cache_root
+    from audio_decode import AudioDecoder
     
     # Load the model
     print("🌿 Loading Wav2Vec2 model...")
-    processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-large-960h")
-    model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-large-960h")
+    processor, model, _ = load_cached_model(
+        "facebook/wav2vec2-large-960h", resolve_cache_root(os.environ.get("GREENVOICE_MODEL_CACHE"))
+    )
     print("✅ Model loaded successfully")
+
+    audio_decoder = AudioDecoder()
     
     MODEL_LOADED = True
     
@@ -56,53 +58,36 @@ class WebMFixHandler(http.server.SimpleHTTPRequestHandler):
         try:
             print("🎵 Starting transcription process...")
             
-            # Save as WebM file (correct format)
-            with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
-                print(f"📁 WebM audio saved to: {temp_file_path}")
-            
-            try:
-                print("📖 Loading WebM audio with librosa...")
-                # Load WebM audio directly (librosa can handle WebM)
-                audio_data_loaded, sr = librosa.load(temp_file_path, sr=16000, mono=True)
-                speech = audio_data_loaded.flatten()
-                print(f"✅ Audio loaded: shape={speech.shape}, sample_rate={sr}")
-                
-                print("🔧 Applying noise reduction...")
-                # Apply noise reduction
-                # speech_clean = nr.reduce_noise(y=speech, sr=16000)
-                print("✅ Noise reduction complete")
-                
-                print("🤖 Processing with Wav2Vec2...")
-                # Process with Wav2Vec2
-                input_values = processor(
-                    speech_clean,
-                    sampling_rate=16000,
-                    return_tensors="pt",
-                    padding=True
-                ).input_values
-                print("✅ Audio processed for model")
-
-                print("🧠 Getting transcription...")
-                # Get transcription
-                with torch.no_grad():
-                    logits = model(input_values).logits
-
-                predicted_ids = torch.argmax(logits, dim=-1)
-                transcription = processor.batch_decode(predicted_ids)[0]
-                
-                print(f"🎉 Raw transcription: '{transcription}'")
-                return transcription.strip()
-                
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_file_path)
-                    print("🗑️  Temp file cleaned up")
-                except:
-                    pass
-                    
+            print("📖 Decoding WebM audio in memory...")
+            speech, path = audio_decoder.decode(audio_data)
+            print(f"✅ Audio loaded: shape={speech.shape}, sample_rate=16000, path={path}")
+
+            print("🔧 Applying noise reduction...")
+            # Apply noise reduction
+            # speech_clean = nr.reduce_noise(y=speech, sr=16000)
+            print("✅ Noise reduction complete")
+
+            print("🤖 Processing with Wav2Vec2...")
+            # Process with Wav2Vec2
+            input_values = processor(
+                speech,
+                sampling_rate=16000,
+                return_tensors="pt",
+                padding=True
+            ).input_values
+            print("✅ Audio processed for model")
+
+            print("🧠 Getting transcription...")
+            # Get transcription
+            with torch.no_grad():
+                logits = model(input_values).logits
+
+            predicted_ids = torch.argmax(logits, dim=-1)
+            transcription = processor.batch_decode(predicted_ids)[0]
+
+            print(f"🎉 Raw transcription: '{transcription}'")
+            return transcription.strip()
+
         except Exception as e:
             error_msg = f"Transcription error: {str(e)}"
             print(f"❌ {error_msg}")
@@ -0,0 +1,242 @@
+import queue
+import subprocess
+import threading
+
+import numpy as np
+
+from audio_decode import FFMPEG, SAMPLE_RATE, DecodeError, ffmpeg_command
+
+
+class StreamingDecoder:
+    """Incremental decode through one ffmpeg process per upload.
+
+    Compressed bytes go in through ``feed()`` while they arrive and a reader
+    thread turns ffmpeg's raw float32 output into arrays, so decoding keeps
+    pace with the network instead of starting after the last byte. Pass a
+    ``DecoderPool`` to take an already running process instead of spawning.
+
+    ffmpeg's stderr is drained on its own thread, since a full pipe would
+    stall it, and a write it has not taken within ``timeout`` seconds kills
+    the process instead of blocking the handler thread.
+    """
+
+    def __init__(self, target_rate=SAMPLE_RATE, timeout=30, pool=None):
+        if FFMPEG is None:
+            raise DecodeError("ffmpeg is not installed")
+
+        self.timeout = timeout
+        self.finished = False
+        self.stalled = False
+        self.errors = b""
+        self.chunks = queue.Queue()
+        if pool is not None:
+            self.process = pool.acquire()
+        else:
+            self.process = subprocess.Popen(
+                ffmpeg_command(target_rate),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        self.reader = threading.Thread(target=self._read_output, name="stream-decoder", daemon=True)
+        self.reader.start()
+        self.error_reader = threading.Thread(target=self._read_errors, name="stream-decoder-stderr", daemon=True)
+        self.error_reader.start()
+
+    def _read_output(self):
+        remainder = b""
+        while True:
+            block = self.process.stdout.read1(65536)
+            if not block:
+                break
+            block = remainder + block
+            usable = len(block) - len(block) % 4
+            remainder = block[usable:]
+            if usable:
+                self.chunks.put(np.frombuffer(block[:usable], dtype="<f4"))
+        self.chunks.put(None)
+
+    def _read_errors(self):
+        while True:
+            try:
+                block = self.process.stderr.read1(4096)
+            except (OSError, ValueError):
+                break
+            if not block:
+                break
+            # The tail is enough for the error message
+            self.errors = (self.errors + block)[-8192:]
+
+    def _error(self):
+        if self.stalled:
+            return f"ffmpeg stopped reading input for {self.timeout}s"
+        self.error_reader.join(timeout=1)
+        return self.errors.decode(errors="replace").strip() or "ffmpeg failed"
+
+    def _stall(self):
+        self.stalled = True
+        if self.process.poll() is None:
+            self.process.kill()
+
+    def _write(self, function, *args):
+        """Run a blocking stdin operation, killing ffmpeg if it does not finish within timeout"""
+        watchdog = threading.Timer(self.timeout, self._stall)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            function(*args)
+        finally:
+            watchdog.cancel()
+
+    def _feed(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def feed(self, data):
+        try:
+            self._write(self._feed, data)
+        except (OSError, ValueError):
+            self.process.wait()
+            raise DecodeError(self._error())
+
+    def read(self):
+        """Every chunk decoded so far; never blocks"""
+        chunks = []
+        while not self.finished:
+            try:
+                chunk = self.chunks.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.finished = True
+            else:
+                chunks.append(chunk)
+        return chunks
+
+    def close(self):
+        """End the input and return the remaining decoded chunks"""
+        try:
+            self._write(self.process.stdin.close)
+        except (OSError, ValueError):
+            pass
+
+        chunks = []
+        while not self.finished:
+            try:
+                chunk = self.chunks.get(timeout=self.timeout)
+            except queue.Empty:
+                self.abort()
+                raise DecodeError(f"ffmpeg produced no output for {self.timeout}s")
+            if chunk is None:
+                self.finished = True
+            else:
+                chunks.append(chunk)
+
+        if self.process.wait(timeout=self.timeout) != 0:
+            raise DecodeError(self._error())
+        return chunks
+
+    def abort(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class BufferedDecoder:
+    """Fallback with the StreamingDecoder interface: collect everything, decode at close"""
+
+    def __init__(self, audio_decoder):
+        self.audio_decoder = audio_decoder
+        self.parts = []
+
+    def feed(self, data):
+        self.parts.append(data)
+
+    def read(self):
+        return []
+
+    def close(self):
+        samples, _ = self.audio_decoder.decode(b"".join(self.parts))
+        return [samples]
+
+    def abort(self):
+        self.parts = []
+
+
+def quiet_point(samples, start, end, frame=320):
+    """Middle of the lowest-energy 20 ms frame in samples[start:end]"""
+    window = samples[start:end]
+    frames = len(window) // frame
+    if frames == 0:
+        return end
+    energy = np.square(window[:frames * frame].reshape(frames, frame)).sum(axis=1)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+class StreamingTranscription:
+    """Queue segments of a still-arriving upload for inference as soon as they are complete.
+
+    Decoded audio is cut roughly every ``segment_seconds``, at the quietest
+    point of the last ``search_seconds`` so words are not split, and each
+    segment goes to the inference pool while the rest is still uploading.
+    With ``max_pending`` set, ``add()`` waits for the oldest job once that
+    many are outstanding, so a long file never has more than a few segments
+    in memory or in the pool's backlog. Only the first segment then goes
+    through admission: a recording already being worked on is not turned
+    into a 429 by later traffic, and max_pending bounds what it adds.
+    """
+
+    def __init__(self, pool, segment_seconds=10, search_seconds=2, deadline=None,
+                 is_disconnected=None, sample_rate=SAMPLE_RATE, min_amplitude=0.01,
+                 max_pending=None):
+        self.pool = pool
+        self.segment = int(segment_seconds * sample_rate)
+        self.search = min(self.segment, int(search_seconds * sample_rate))
+        self.deadline = deadline
+        self.is_disconnected = is_disconnected
+        self.sample_rate = sample_rate
+        self.min_amplitude = min_amplitude
+        self.max_pending = max_pending
+
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.jobs = []
+        self.results = []
+        self.decoded_samples = 0
+        self.skipped = 0
+
+    def add(self, chunks):
+        if not chunks:
+            return
+        self.pending = np.concatenate([self.pending, *chunks])
+        self.decoded_samples += sum(len(chunk) for chunk in chunks)
+
+        while len(self.pending) >= self.segment:
+            cut = quiet_point(self.pending, self.segment - self.search, self.segment)
+            self._submit(self.pending[:cut])
+            self.pending = self.pending[cut:]
+
+    def _submit(self, segment):
+        max_amp = float(np.max(np.abs(segment))) if len(segment) else 0.0
+        if max_amp < self.min_amplitude:
+            # Silence between utterances: nothing for the model to do
+            self.skipped += 1
+            return
+        if self.max_pending is not None:
+            while len(self.jobs) >= self.max_pending:
+                job = self.jobs.pop(0)
+                self.results.append((self.pool.wait(job), job.duration))
+        admit = self.max_pending is None or not (self.jobs or self.results)
+        self.jobs.append(
+            self.pool.submit(segment / max_amp, self.deadline, self.is_disconnected, admit=admit)
+        )
+
+    def finish(self):
+        """Queue the tail and wait; returns [(result, duration_seconds)] in audio order"""
+        if len(self.pending):
+            self._submit(self.pending)
+            self.pending = self.pending[:0]
+        return self.results + [(self.pool.wait(job), job.duration) for job in self.jobs]
+
+    def cancel(self, reason):
+        for job in self.jobs:
+            self.pool.cancel(job, reason)
@@ -0,0 +1,106 @@
+import os
+
+import torch
+
+
+def available_cpus():
+    """CPUs this process may run on (respects taskset/cgroup cpusets)"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+class ThreadPlan:
+    """How inference work is laid out over the machine's cores.
+
+    ``processes`` x ``workers`` inference threads each run with
+    ``intra_op_threads`` PyTorch threads, so the product should not exceed
+    the core count. With ``pin`` each worker thread (and the OpenMP threads
+    it spawns) is bound to its own disjoint slice of CPUs.
+    """
+
+    def __init__(self, workers, intra_op_threads=None, inter_op_threads=1, pin=False, processes=1):
+        self.workers = max(1, int(workers))
+        self.processes = max(1, int(processes))
+        self.cpus = available_cpus()
+
+        slots = self.workers * self.processes
+        if not intra_op_threads:
+            intra_op_threads = max(1, len(self.cpus) // slots)
+        self.intra_op_threads = max(1, int(intra_op_threads))
+        self.inter_op_threads = max(1, int(inter_op_threads))
+        self.pin = bool(pin)
+
+    @classmethod
+    def parse(cls, spec, inter_op_threads=1, pin=False, processes=1):
+        """Build a plan from "WORKERSxTHREADS", e.g. "4x8" (threads may be "auto")"""
+        workers, _, threads = spec.lower().partition("x")
+        threads = None if threads in ("", "auto") else int(threads)
+        return cls(int(workers), threads, inter_op_threads, pin, processes)
+
+    @property
+    def name(self):
+        label = f"{self.workers}x{self.intra_op_threads}"
+        if self.processes > 1:
+            label = f"{self.processes}p*{label}"
+        return label + (" pinned" if self.pin else "")
+
+    def oversubscribed(self):
+        return self.processes * self.workers * self.intra_op_threads > len(self.cpus)
+
+    def cpus_for(self, worker_index, process_index=0):
+        """Disjoint CPU slice for one worker thread, wrapping if the box is too small"""
+        slot = process_index * self.workers + worker_index
+        start = slot * self.intra_op_threads
+        return [self.cpus[(start + i) % len(self.cpus)] for i in range(self.intra_op_threads)]
+
+    def apply_process(self):
+        """Process-wide settings; call once, before the first model forward pass.
+
+        torch refuses to change the inter-op pool after it has started, so a
+        late call only logs a warning.
+        """
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.inter_op_threads)
+        except RuntimeError as e:
+            print(f"⚠️ Could not set inter-op threads: {e}")
+
+        if self.oversubscribed():
+            print(
+                f"⚠️ Thread plan {self.name} uses"
+                f" {self.processes * self.workers * self.intra_op_threads} threads"
+                f" on {len(self.cpus)} CPUs"
+            )
+
+    def apply_worker(self, worker_index, process_index=0):
+        """Per-thread settings, run at the start of each inference worker thread.
+
+        The OpenMP thread count is per calling thread, and on Linux
+        sched_setaffinity(0) binds only the calling thread, whose OpenMP team
+        inherits the mask when it is created on the first forward pass.
+        """
+        torch.set_num_threads(self.intra_op_threads)
+        if not self.pin:
+            return None
+
+        cpus = self.cpus_for(worker_index, process_index)
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError) as e:
+            print(f"⚠️ CPU pinning unavailable: {e}")
+            return None
+        return cpus
+
+    def stats(self):
+        return {
+            "plan": self.name,
+            "processes": self.processes,
+            "workers": self.workers,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "pinned": self.pin,
+            "cpus": len(self.cpus),
+            "oversubscribed": self.oversubscribed()
+        }
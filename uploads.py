@@ -0,0 +1,160 @@
+import base64
+import json
+import re
+
+
+class UploadRejected(Exception):
+    """Request body that is not a usable audio upload"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Bodies that are the encoded audio itself; the decoder works out the codec
+RAW_AUDIO_TYPES = ("application/octet-stream", "video/webm", "video/ogg")
+
+# One "; key=value" header parameter, the value quoted or bare
+HEADER_PARAM = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+def media_type(content_type):
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def content_type_param(content_type, name):
+    for param in (content_type or "").split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == name:
+            return value.strip().strip('"')
+    return None
+
+
+def disposition_params(headers):
+    """Parameters of the Content-Disposition line in a multipart part's headers (keys lowercased)"""
+    for line in headers.split("\r\n"):
+        key, _, value = line.partition(":")
+        if key.strip().lower() != "content-disposition":
+            continue
+        params = {}
+        for name, raw in HEADER_PARAM.findall(value):
+            raw = raw.strip()
+            if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+                raw = re.sub(r'\\(.)', r'\1', raw[1:-1])
+            params[name.lower()] = raw
+        return params
+    return {}
+
+
+def is_raw_audio(content_type):
+    kind = media_type(content_type)
+    return kind.startswith("audio/") or kind in RAW_AUDIO_TYPES
+
+
+def parse_json_upload(body):
+    """Decode the {"audio": <base64>} request body used by older web clients"""
+    data = json.loads(body.decode('utf-8'))
+    return base64.b64decode(data['audio'])
+
+
+def parse_multipart_upload(body, content_type):
+    """Bytes of the "audio" part, else the first file part, of a multipart/form-data body.
+
+    Parts are located with find() over the original body, so the audio is
+    copied once, when its slice is taken.
+    """
+    boundary = content_type_param(content_type, "boundary")
+    if not boundary:
+        raise UploadRejected("Multipart upload without a boundary")
+
+    delimiter = b"--" + boundary.encode("latin-1")
+    first_file = None
+
+    position = body.find(delimiter)
+    while position != -1:
+        start = position + len(delimiter)
+        if body.startswith(b"--", start):
+            break
+
+        header_end = body.find(b"\r\n\r\n", start)
+        if header_end == -1:
+            break
+        end = body.find(b"\r\n" + delimiter, header_end)
+        if end == -1:
+            break
+
+        params = disposition_params(body[start:header_end].decode("latin-1"))
+        if params.get("name") == "audio":
+            return body[header_end + 4:end]
+        if first_file is None and "filename" in params:
+            first_file = (header_end + 4, end)
+
+        position = end + 2
+
+    if first_file is None:
+        raise UploadRejected("Multipart upload has no audio part")
+    return body[first_file[0]:first_file[1]]
+
+
+def parse_upload(body, content_type):
+    """Audio bytes from a /api/transcribe body in any of the accepted encodings.
+
+    - ``application/json`` (or no Content-Type): ``{"audio": <base64>}``
+    - ``multipart/form-data``: an ``audio`` file field
+    - ``audio/*``, ``video/webm``, ``application/octet-stream``: the raw file,
+      passed through without a copy
+    """
+    kind = media_type(content_type) or "application/json"
+
+    if kind == "application/json":
+        try:
+            audio = parse_json_upload(body)
+        except (ValueError, KeyError, TypeError) as e:
+            raise UploadRejected(f"Invalid JSON upload: {e}")
+    elif kind == "multipart/form-data":
+        audio = parse_multipart_upload(body, content_type)
+    elif is_raw_audio(kind):
+        audio = body
+    else:
+        raise UploadRejected(f"Unsupported Content-Type: {kind}", status=415)
+
+    if not audio:
+        raise UploadRejected("Empty audio upload")
+    return audio
+
+
+def iter_chunked_body(rfile, max_line=65536):
+    """Yield the chunks of a Transfer-Encoding: chunked request body as they arrive"""
+    while True:
+        line = rfile.readline(max_line + 1)
+        if not line:
+            raise UploadRejected("Chunked upload ended early")
+        try:
+            size = int(line.split(b";")[0].strip(), 16)
+        except ValueError:
+            raise UploadRejected("Malformed chunk size in chunked upload")
+
+        if size == 0:
+            # Skip optional trailers up to the blank line that ends the body
+            while line not in (b"\r\n", b"\n", b""):
+                line = rfile.readline(max_line + 1)
+            return
+
+        data = rfile.read(size)
+        if len(data) < size:
+            raise UploadRejected("Chunked upload ended early")
+        rfile.readline()
+        yield data
+
+
+def iter_sized_body(rfile, content_length, block_size=65536):
+    """Yield a Content-Length request body in blocks as they arrive"""
+    remaining = content_length
+    while remaining > 0:
+        # read1 returns what has arrived instead of waiting for a full block
+        read = getattr(rfile, "read1", rfile.read)
+        data = read(min(block_size, remaining))
+        if not data:
+            raise UploadRejected("Upload ended early")
+        remaining -= len(data)
+        yield data
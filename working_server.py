@@ -1,20 +1,29 @@
 import os
 import json
 import base64
-import tempfile
 import numpy as np
 import librosa
-import torch
 import noisereduce as nr
 import sys
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import webbrowser
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+from inference_pool import InferencePool, PoolFullError
+from model_cache import load_cached_model, resolve_cache_root
+from model_runner import transcribe_batch
+from audio_decode import AudioDecoder
 
 # Set the port
 PORT = 8091
 
+# Local memory-mapped weight cache (see serve_final.py)
+MODEL_CACHE = resolve_cache_root(os.environ.get("GREENVOICE_MODEL_CACHE"))
+
+# Inference scheduling (same settings as serve_final.py)
+INFERENCE_WORKERS = int(os.environ.get("GREENVOICE_WORKERS", 2))
+SCHEDULER_POLICY = os.environ.get("GREENVOICE_SCHEDULER", "sjf")
+SJF_AGING = float(os.environ.get("GREENVOICE_SJF_AGING", 1.0))
+
 # Recording parameters (EXACT from notebook)
 SAMPLE_RATE = 16000
 
@@ -22,13 +31,21 @@ print("🌿 Loading Wav2Vec2 model for GreenVoice...")
 
 # Try a simpler model loading approach
 try:
-    processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-large-960h")
-    model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-large-960h")
+    processor, model, _ = load_cached_model("facebook/wav2vec2-large-960h", MODEL_CACHE)
     print("✅ Model Loaded Successfully")
 except Exception as e:
     print(f"❌ Model loading failed: {e}")
     sys.exit(1)
 
+# Shortest-job-first scheduler in front of the model
+inference_pool = InferencePool(
+    lambda speeches: transcribe_batch(processor, model, speeches, sampling_rate=SAMPLE_RATE),
+    workers=INFERENCE_WORKERS,
+    sample_rate=SAMPLE_RATE,
+    policy=SCHEDULER_POLICY,
+    aging=SJF_AGING
+)
+
 class GreenVoiceTranscriber:
     def __init__(self):
         self.sample_rate = SAMPLE_RATE
@@ -42,28 +59,28 @@ class GreenVoiceTranscriber:
             speech_clean = nr.reduce_noise(y=audio_data, sr=self.sample_rate)
             print("✅ Noise reduction complete")
             
-            # Simple processing - avoid complex transformers issues
-            input_values = processor(speech_clean, sampling_rate=self.sample_rate, return_tensors="pt")
-            print(f"✅ Audio processed: {input_values.shape}")
-            
-            # Get transcription
-            with torch.no_grad():
-                logits = model(input_values).logits
-                predicted_ids = torch.argmax(logits, dim=-1)
-                
-                # Try simple decode
-                try:
-                    transcription = processor.batch_decode(predicted_ids)[0]
-                    print(f"✅ Transcription: '{transcription}'")
-                except Exception as e:
-                    print(f"❌ Decode error: {e}")
-                    # Fallback: return IDs as text
-                    ids = predicted_ids[0].tolist()
-                    transcription = f"IDs: {ids[:10]}..."  # Show first 10
-                    print(f"✅ Fallback: {transcription}")
+            # Queue for the model; short clips are scheduled ahead of long ones
+            transcription = inference_pool.transcribe(speech_clean)
+            print(f"✅ Transcription: '{transcription}'")
             
-            return transcription.strip() if 'transcription' in locals() else transcription
+            return transcription.strip()
             
+        except PoolFullError:
+            raise
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return f"Error: {str(e)}"
+
+    def transcribe_audio_bytes(self, audio_bytes):
+        """Transcribe an upload decoded in memory (temp file only as a fallback)"""
+        try:
+            speech, path = audio_decoder.decode(audio_bytes)
+            print(f"✅ Audio decoded via {path}: shape={speech.shape}")
+
+            return self.transcribe_audio_array(speech)
+
+        except PoolFullError:
+            raise
         except Exception as e:
             print(f"❌ Error: {e}")
             return f"Error: {str(e)}"
@@ -81,12 +98,15 @@ class GreenVoiceTranscriber:
             # Use array method
             return self.transcribe_audio_array(speech)
             
+        except PoolFullError:
+            raise
         except Exception as e:
             print(f"❌ Error: {e}")
             return f"Error: {str(e)}"
 
-# Initialize transcriber
+# Initialize transcriber and the in-memory upload decoder
 transcriber = GreenVoiceTranscriber()
+audio_decoder = AudioDecoder(SAMPLE_RATE)
 
 # Create Flask app
 app = Flask(__name__)
@@ -113,33 +133,24 @@ def transcribe():
             print(f"❌ Base64 decode error: {e}")
             return jsonify({"error": f"Base64 decode error: {str(e)}"}), 400
         
-        # Save to temporary file
-        temp_file_path = None
         try:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
-            
-            # Transcribe audio
-            transcription = transcriber.transcribe_audio_file(temp_file_path)
+            # Transcribe audio straight from the request bytes
+            transcription = transcriber.transcribe_audio_bytes(audio_data)
             
             return jsonify({
                 "transcription": transcription,
                 "status": "success"
             })
             
+        except PoolFullError as e:
+            print(f"⏳ {e}, rejecting request")
+            response = jsonify({"error": str(e), "status": "busy", "retry_after": e.retry_after})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
+            
         except Exception as e:
             print(f"❌ Transcription error: {e}")
             return jsonify({"error": str(e)}), 500
-            
-        finally:
-            # Clean up temporary file
-            if temp_file_path:
-                try:
-                    os.unlink(temp_file_path)
-                    print(f"📥 Cleaned temp file: {temp_file_path}")
-                except:
-                    pass
                     
     except Exception as e:
         print(f"❌ API Error: {e}")
@@ -162,6 +173,8 @@ def run_server():
     print("⏹️ Press Ctrl+C to stop the server")
     
     try:
+        inference_pool.start()
+        
         # Open browser automatically
         webbrowser.open(f'http://localhost:{PORT}')
         